@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+
+from . import VERSION
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 65536
+
+
+# BLAKE2 is faster than SHA256, but needs Python 3.6
+new_digest = getattr(hashlib, 'blake2b', hashlib.sha256)
+
+
+def file_digest(path):
+    """
+    Return the digest of the contents of `path`, remembering it for as long as
+    the file is unchanged.
+    """
+
+    key = _digest_key(path)
+
+    digest = _DIGESTS.get(key)
+    if digest is None:
+        h = new_digest()
+        with open(path, 'rb') as f:
+            for buf in iter(lambda: f.read(CHUNK_SIZE), b''):
+                h.update(buf)
+        digest = _DIGESTS[key] = h.hexdigest()
+
+    return digest
+
+
+def remember_digest(path, digest):
+    """
+    Remember the (hex) digest of `path`, computed with new_digest() while the
+    file was being read or written anyway.
+    """
+
+    _DIGESTS[_digest_key(path)] = digest
+
+
+def _digest_key(path):
+    path = os.fsdecode(path)
+    st = os.stat(path)
+    return (path, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+_DIGESTS = {}
+
+
+class DigestingWriter(object):
+    """
+    Write a file, remembering the digest of its contents when done.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.hash = new_digest()
+
+    def write(self, buf):
+        self.hash.update(buf)
+        return self.file.write(buf)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.file.close()
+        if exc_type is None:
+            remember_digest(self.file.name, self.hash.hexdigest())
+
+
+def tool_fingerprint(name):
+    """
+    Identify the installed version of a tool without running it.
+    """
+
+    path = shutil.which(name)
+    if path is None:
+        return None
+
+    st = os.stat(path)
+    return [os.path.realpath(path), st.st_size, st.st_mtime_ns]
+
+
+class DirectoryCache(object):
+    """
+    Files in a directory of the on-disk cache, evicting the least recently
+    used ones once they take up more than `max_size` bytes in total.
+    """
+
+    def __init__(self, path, max_size):
+        self.path = path
+        self.max_size = max_size
+        os.makedirs(path, exist_ok=True)
+        self.size = sum(x.stat().st_size for x in self.entries())
+
+    def entries(self):
+        # Files still being written start with a dot
+        return [
+            x for x in os.scandir(self.path)
+            if x.is_file() and not x.name.startswith('.')
+        ]
+
+    def filename(self, key, suffix=''):
+        return os.path.join(self.path, key + suffix)
+
+    def touch(self, *filenames):
+        for x in filenames:
+            try:
+                os.utime(x)
+            except OSError:
+                pass
+
+    def tempfile(self):
+        return tempfile.NamedTemporaryFile(
+            dir=self.path,
+            prefix='.',
+            suffix='_diffoscope',
+            delete=False,
+        )
+
+    def added(self, size):
+        self.size += size
+        if self.size > self.max_size:
+            self.evict()
+
+    def evict(self):
+        entries = []
+        for x in self.entries():
+            try:
+                entries.append((x.stat().st_mtime, x.stat().st_size, x.path))
+            except FileNotFoundError:
+                pass
+
+        # Other processes may be using the cache, so start from the truth.
+        self.size = sum(x[1] for x in entries)
+        entries.sort()
+
+        while entries and self.size > self.max_size:
+            _, size, path = entries.pop(0)
+            logger.debug("Evicting %s from cache", path)
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            self.size -= size
+
+
+class OutputCache(object):
+    """
+    Keeps the output of external commands (after filtering) in --cache-dir,
+    so that it does not need to be computed again when a file is compared in
+    a later run.
+    """
+
+    _singleton = {}
+
+    def __init__(self):
+        self.__dict__ = self._singleton
+
+        if not self._singleton:
+            self.cache = None
+
+    def setup(self, cache_dir, max_size):
+        self.cache = None
+        if cache_dir is not None:
+            self.cache = DirectoryCache(
+                os.path.join(cache_dir, 'output'),
+                max_size,
+            )
+
+    def key(self, command):
+        """
+        Return the key for the output of `command`, or None if it should not
+        be cached.
+        """
+
+        if self.cache is None:
+            return None
+
+        # The output also depends on what we feed to the command
+        if command.has_stdin():
+            return None
+
+        try:
+            digest = file_digest(command.path)
+        except OSError:
+            return None
+
+        key = json.dumps([
+            VERSION,
+            '{}.{}'.format(
+                command.__class__.__module__,
+                command.__class__.__qualname__,
+            ),
+            command.shell_cmdline(),
+            tool_fingerprint(command.cmdline()[0]),
+            sorted((command.env() or {}).items()),
+            Config().max_diff_input_lines,
+            digest,
+        ], default=str)
+
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Return an open file with the cached output and its metadata for `key`,
+        or None if it is not in the cache.
+        """
+
+        output = self.cache.filename(key, '.out')
+        metadata = self.cache.filename(key, '.json')
+        try:
+            with open(metadata) as f:
+                meta = json.load(f)
+            f = open(output, 'rb')
+        except (OSError, ValueError):
+            return None
+
+        self.cache.touch(output, metadata)
+        return f, meta
+
+    def writer(self, key, command):
+        return OutputWriter(self.cache, key, command)
+
+
+class OutputWriter(object):
+    """
+    Stores the output of a command as it is passed on, unless it mentions
+    where the file was, which may differ between runs.
+    """
+
+    def __init__(self, cache, key, command):
+        self.cache = cache
+        self.key = key
+        self.path = command.path.encode('utf-8', errors='surrogateescape')
+        self.tail = b''
+        self.file = cache.tempfile()
+        self.size = 0
+
+    def write(self, data):
+        if self.file is None:
+            return
+
+        if self.path in self.tail + data:
+            logger.debug("Not caching output mentioning %s", self.path)
+            self.abort()
+            return
+
+        self.file.write(data)
+        self.size += len(data)
+        self.tail = (self.tail + data)[-len(self.path):]
+
+    def commit(self, end_nl, stderr):
+        if self.file is None:
+            return
+
+        self.file.close()
+        meta = json.dumps({
+            'end_nl': end_nl,
+            'stderr': stderr.decode('utf-8', errors='surrogateescape'),
+        })
+
+        os.replace(self.file.name, self.cache.filename(self.key, '.out'))
+        with self.cache.tempfile() as f:
+            f.write(meta.encode('utf-8'))
+        os.replace(f.name, self.cache.filename(self.key, '.json'))
+
+        self.file = None
+        self.cache.added(self.size + len(meta))
+
+    def abort(self):
+        if self.file is None:
+            return
+
+        self.file.close()
+        os.unlink(self.file.name)
+        self.file = None
+
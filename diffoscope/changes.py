@@ -49,6 +49,7 @@ import subprocess
 from debian import deb822
 
 from .tools import tool_required
+from .scheduler import Scheduler
 
 logger = logging.getLogger(__name__)
 
@@ -252,11 +253,12 @@ class Changes(object):
         Throws a :class:`dput.exceptions.ChangesFileException` if there's
         an issue with the GPG signature. Returns the GPG key ID.
         """
-        pipe = subprocess.Popen(
-            ["gpg", "--status-fd", "1", "--verify", "--batch",
-             self.get_changes_file()],
-            shell=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        gpg_output, gpg_output_stderr = pipe.communicate()
+        with Scheduler().slot():
+            pipe = subprocess.Popen(
+                ["gpg", "--status-fd", "1", "--verify", "--batch",
+                 self.get_changes_file()],
+                shell=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            gpg_output, gpg_output_stderr = pipe.communicate()
         print(gpg_output)
 
         if pipe.returncode != 0:
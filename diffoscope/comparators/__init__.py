@@ -19,12 +19,149 @@
 # You should have received a copy of the GNU General Public License
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
+import re
+import sys
 import logging
+import collections
 import importlib
 
 logger = logging.getLogger(__name__)
 
 
+class Hint(object):
+    """
+    What a file needs to look like for a comparator to possibly recognize it,
+    tested like File.recognizes() does: (file_type OR header) AND extension.
+    """
+
+    def __init__(self, file_type=None, header=None, extension=None, flags=0):
+        self.file_type = file_type
+        self.flags = flags
+        self.header = header
+        self.extension = extension
+
+    def matches(self, file):
+        if self.extension is not None and \
+                not file.name.endswith(self.extension):
+            return False
+
+        if self.file_type is None and self.header is None:
+            return True
+
+        if self.file_type is not None and \
+                self.file_type_re.search(file.magic_file_type):
+            return True
+
+        return self.header is not None and \
+            file.file_header.startswith(self.header)
+
+    @property
+    def file_type_re(self):
+        # Only compiled when needed, so that startup stays quick
+        if not hasattr(self, '_file_type_re'):
+            self._file_type_re = re.compile(self.file_type, self.flags)
+        return self._file_type_re
+
+
+def first_word(pattern):
+    """
+    Return the first word of whatever `pattern` matches, if it is anchored and
+    that word is spelled out, eg. "ELF" for r'^ELF '.
+    """
+
+    m = re.match(r'\^([^\s.^$*+?{}\[\]\\|()]+) (?![*+?{])', pattern)
+    if m is None:
+        return None
+    return m.group(1)
+
+
+class HintIndex(object):
+    """
+    Finds which comparators could recognize a file by looking up its
+    extension, header and the first word of its file type in an index of
+    their hints, instead of testing all of them.
+
+    `hints` has the hints for each comparator, None if it could recognize any
+    file.
+    """
+
+    # Cheapest first, as the file type needs libmagic
+    LOOKUPS = ('extension', 'header', 'file_type')
+
+    def __init__(self, hints):
+        self.always = set()
+        self.lookups = {}
+        self.extensions = collections.defaultdict(list)
+        self.headers = {}
+        self.file_types = collections.defaultdict(list)
+        self.other_file_types = []
+
+        for index, xs in enumerate(hints):
+            if xs is None:
+                self.always.add(index)
+                continue
+            self.lookups[index] = lookups = set()
+            for hint in xs:
+                entry = (index, hint)
+                if hint.extension is not None:
+                    self.extensions[hint.extension].append(entry)
+                    lookups.add('extension')
+                    continue
+                if hint.header is not None:
+                    node = self.headers
+                    for x in hint.header:
+                        node = node.setdefault(x, {})
+                    node.setdefault(None, []).append(entry)
+                    lookups.add('header')
+                if hint.file_type is not None:
+                    word = None if hint.flags else first_word(hint.file_type)
+                    if word is None:
+                        self.other_file_types.append(entry)
+                    else:
+                        self.file_types[word].append(entry)
+                    lookups.add('file_type')
+            self.lookups[index] = tuple(
+                x for x in self.LOOKUPS if x in lookups
+            )
+
+        self.extension_lengths = sorted({len(x) for x in self.extensions})
+
+    def could_recognize(self, index, file, found):
+        """
+        Whether the hints of the `index`-th comparator match `file`. What
+        was found by each lookup is kept in `found`.
+        """
+
+        for x in self.lookups[index]:
+            if x not in found:
+                found[x] = {
+                    i for i, hint in getattr(self, 'find_{}'.format(x))(file)
+                    if hint.matches(file)
+                }
+            if index in found[x]:
+                return True
+        return False
+
+    def find_extension(self, file):
+        for x in self.extension_lengths:
+            yield from self.extensions.get(file.name[-x:], ())
+
+    def find_header(self, file):
+        node = self.headers
+        for x in file.file_header:
+            yield from node.get(None, ())
+            try:
+                node = node[x]
+            except KeyError:
+                return
+        yield from node.get(None, ())
+
+    def find_file_type(self, file):
+        word = file.magic_file_type.split(' ', 1)[0]
+        yield from self.file_types.get(word, ())
+        yield from self.other_file_types
+
+
 class ComparatorManager(object):
     COMPARATORS = (
         ('directory.Directory',),
@@ -92,6 +229,104 @@ class ComparatorManager(object):
         ('ogg.OggFile',),
     )
 
+    # Which files each comparator could recognize, so that its module (and
+    # whatever that needs, eg. libarchive) is only imported once one of them
+    # comes along. These must match the FILE_TYPE_RE, etc. of the classes, or
+    # be looser than their own recognizes(), which
+    # tests/comparators/test_utils.py checks for all those that don't have
+    # one of their own. Comparators which are not listed
+    # are always imported, and those without any hints only recognize members
+    # of the containers of their own (already imported) module.
+    HINTS = {
+        'debian.DotChangesFile': (Hint(extension='.changes'),),
+        'debian_fallback.DotChangesFile': (
+            Hint(r'\btext\b', extension='.changes'),
+        ),
+        'debian.DotDscFile': (Hint(extension='.dsc'),),
+        'debian_fallback.DotDscFile': (Hint(r'\btext\b', extension='.dsc'),),
+        'debian.DotBuildinfoFile': (Hint(extension='.buildinfo'),),
+        'debian_fallback.DotBuildinfoFile': (
+            Hint(r'\btext\b', extension='.buildinfo'),
+        ),
+        'deb.Md5sumsFile': (),
+        'deb.DebDataTarFile': (),
+        'elf.ElfSection': (),
+        'binwalk.BinwalkFile': (Hint(r'\bcpio archive\b'),),
+        'ps.PsFile': (Hint(r'^PostScript document\b'),),
+        'javascript.JavaScriptFile': (Hint(extension='.js'),),
+        'json.JSONFile': (Hint(extension='.json'),),
+        'xml.XMLFile': (Hint(extension='.xml'),),
+        'text.TextFile': (Hint(r'\btext\b'),),
+        'bzip2.Bzip2File': (Hint(r'^bzip2 compressed data\b'),),
+        'cpio.CpioFile': (Hint(r'\bcpio archive\b'),),
+        'deb.DebFile': (Hint(r'^Debian binary package'),),
+        'dex.DexFile': (Hint(r'^Dalvik dex file .*\b'),),
+        'elf.ElfFile': (Hint(r'^ELF '),),
+        'macho.MachoFile': (Hint(r'^Mach-O '),),
+        'fsimage.FsImageFile': (
+            Hint(r'^(Linux.*filesystem data|BTRFS Filesystem).*'),
+        ),
+        'elf.StaticLibFile': (Hint(r'\bar archive\b', extension='.a'),),
+        'llvm.LlvmBitCodeFile': (Hint(r'^LLVM IR bitcode'),),
+        'sqlite.Sqlite3Database': (Hint(r'^SQLite 3.x database'),),
+        'fonts.TtfFile': (
+            Hint(r'^(TrueType|OpenType) font data', flags=re.IGNORECASE),
+        ),
+        'fontconfig.FontconfigCacheFile': (
+            Hint(header=b'\x04\xfc', extension='-le64.cache-4'),
+        ),
+        'gettext.MoFile': (Hint(r'^GNU message catalog\b'),),
+        'ipk.IpkFile': (
+            Hint(r'^gzip compressed data\b', extension='.ipk'),
+            Hint(header=b'\x1f\x8b', extension='.ipk'),
+        ),
+        'rust.RustObjectFile': (
+            Hint(header=b'RUST_OBJECT\x01\x00\x00\x00', extension='.deflate'),
+        ),
+        'gzip.GzipFile': (
+            Hint(r'^gzip compressed data\b'),
+            Hint(header=b'\x1f\x8b', extension='.gz'),
+        ),
+        'haskell.HiFile': (Hint(extension='hi'),),
+        'icc.IccFile': (Hint(r'\bColorSync (ICC|color) [Pp]rofile'),),
+        'java.ClassFile': (Hint(r'^compiled Java class data\b'),),
+        'mono.MonoExeFile': (Hint(r'\bPE[0-9]+\b.*\bMono\b'),),
+        'pdf.PdfFile': (Hint(r'^PDF document\b'),),
+        'png.PngFile': (Hint(r'^PNG image data\b'),),
+        'ppu.PpuFile': (Hint(extension='.ppu'),),
+        'rdata.RdbFile': (Hint(extension='.rdb'),),
+        'rdata.RdsFile': (Hint(header=b'X\n\x00\x00\x00\x02\x00\x03'),),
+        'rpm.RpmFile': (Hint(r'^RPM\s'),),
+        'rpm_fallback.RpmFile': (Hint(r'^RPM\s'),),
+        'squashfs.SquashfsFile': (Hint(r'^Squashfs filesystem\b'),),
+        'ar.ArFile': (Hint(r'\bar archive\b'),),
+        'tar.TarFile': (Hint(r'\btar archive\b'),),
+        'xz.XzFile': (
+            Hint(r'^XZ compressed data$'),
+            Hint(header=b'\xfd7zXZ\x00', extension='.xz'),
+        ),
+        'apk.ApkFile': (
+            Hint(r'^(Java|Zip) archive data.*\b', b'PK\x03\x04', '.apk'),
+        ),
+        'odt.OdtFile': (Hint(r'^OpenDocument Text\b'),),
+        'docx.DocxFile': (Hint(r'^Microsoft Word 2007+\b'),),
+        'zip.ZipFile': (Hint(
+            r'^(Zip archive|Java archive|EPUB document|OpenDocument '
+            r'(Text|Spreadsheet|Presentation|Drawing|Formula|Template|Text '
+            r'Template))\b'
+        ),),
+        'image.JPEGImageFile': (Hint(r'\bJPEG image data\b'),),
+        'image.ICOImageFile': (Hint(r'\bMS Windows icon resource\b'),),
+        'git.GitIndexFile': (Hint(r'^Git index'),),
+        'android.AndroidBootImgFile': (Hint(r'^Android bootimg\b'),),
+        'openssh.PublicKeyFile': (Hint(r'^OpenSSH \S+ public key'),),
+        'gif.GifFile': (Hint(r'^GIF image data\b'),),
+        'pcap.PcapFile': (Hint(r'^tcpdump capture file\b'),),
+        'pgp.PgpFile': (Hint(r'^PGP message\b'),),
+        'dtb.DeviceTreeFile': (Hint(r'^Device Tree Blob'),),
+        'ogg.OggFile': (Hint(r'^Ogg data'),),
+    }
+
     _singleton = {}
 
     def __init__(self):
@@ -101,25 +336,86 @@ class ComparatorManager(object):
             self.reload()
 
     def reload(self):
-        self.classes = []
+        self.loaded = {}
+        self.index = None
 
-        for xs in self.COMPARATORS:
-            for x in xs:
-                package, klass_name = x.rsplit('.', 1)
+    def load(self, index):
+        """
+        Return the class of the `index`-th comparator, importing it if needed.
+        """
 
-                try:
-                    mod = importlib.import_module(
-                        'diffoscope.comparators.{}'.format(package)
-                    )
-                except ImportError:
-                    continue
+        try:
+            return self.loaded[index]
+        except KeyError:
+            pass
+
+        xs = self.COMPARATORS[index]
+        for x in xs:
+            package, klass_name = x.rsplit('.', 1)
+
+            try:
+                mod = importlib.import_module(
+                    'diffoscope.comparators.{}'.format(package)
+                )
+            except ImportError:
+                continue
+
+            logger.debug("Loaded comparator %s", x)
+            self.loaded[index] = getattr(mod, klass_name)
+            return self.loaded[index]
+
+        raise ImportError("Could not import {}{}".format(
+            "any of" if len(xs) > 1 else '',
+            ', '.join(xs)
+        ))
+
+    def load_all(self):
+        return [self.load(x) for x in range(len(self.COMPARATORS))]
+
+    def is_imported(self, index):
+        if index in self.loaded:
+            return True
+
+        return any(
+            'diffoscope.comparators.{}'.format(x.rsplit('.', 1)[0])
+            in sys.modules for x in self.COMPARATORS[index]
+        )
+
+    def hints(self, index):
+        for x in self.COMPARATORS[index]:
+            if x in self.HINTS:
+                return self.HINTS[x]
+        return None
+
+    def candidates(self, file):
+        """
+        Yield the comparator classes, in order, which could recognize `file`,
+        importing them as needed.
+        """
+
+        if self.index is None:
+            self.index = HintIndex(
+                [self.hints(x) for x in range(len(self.COMPARATORS))],
+            )
+
+        found = {}
+        bases = type(file).__mro__
+        for index in range(len(self.COMPARATORS)):
+            if index in self.index.always or \
+                    self.loaded.get(index) in bases:
+                yield self.load(index)
+            elif not self.index.lookups[index]:
+                if self.is_imported(index):
+                    yield self.load(index)
+            elif self.index.could_recognize(index, file, found):
+                yield self.load(index)
 
-                self.classes.append(getattr(mod, klass_name))
-                break
-            else:  # noqa
-                raise ImportError("Could not import {}{}".format(
-                    "any of" if len(xs) > 1 else '',
-                    ', '.join(xs)
-                ))
+    def imported(self):
+        """
+        Yield the comparator classes whose modules were imported already, ie.
+        those that files could be instances of.
+        """
 
-        logger.debug("Loaded %d comparator classes", len(self.classes))
+        for index in range(len(self.COMPARATORS)):
+            if self.is_imported(index):
+                yield self.load(index)
@@ -23,6 +23,7 @@ import logging
 import subprocess
 
 from diffoscope.tools import tool_required
+from diffoscope.scheduler import check_call
 from diffoscope.tempfiles import get_temporary_directory
 from diffoscope.difference import Difference
 
@@ -59,7 +60,7 @@ class AndroidBootImgContainer(Archive):
             self._unpacked.name,
         )
 
-        subprocess.check_call(
+        check_call(
             ['abootimg', '-x', os.path.abspath(self.source.path)],
             cwd=self._unpacked.name,
             stdout=subprocess.PIPE,
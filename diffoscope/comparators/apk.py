@@ -23,6 +23,7 @@ import logging
 import subprocess
 
 from diffoscope.tools import tool_required
+from diffoscope.scheduler import check_call
 from diffoscope.tempfiles import get_temporary_directory
 from diffoscope.difference import Difference
 
@@ -52,7 +53,7 @@ class ApkContainer(Archive):
 
         logger.debug("Extracting %s to %s", self.source.name, self._unpacked)
 
-        subprocess.check_call((
+        check_call((
             'apktool', 'd', '-k', '-m', '-o', self._unpacked, self.source.path,
         ), shell=False, stderr=None, stdout=subprocess.PIPE)
 
@@ -57,6 +57,7 @@ class BinwalkFileContainer(Archive):
 class BinwalkFile(File):
     FILE_TYPE_RE = re.compile(r'\bcpio archive\b')
     CONTAINER_CLASS = BinwalkFileContainer
+    EXPENSIVE_RECOGNIZES = True
 
     @classmethod
     def recognizes(cls, file):
@@ -18,11 +18,12 @@
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
 import re
-import os.path
+import bz2
+import shutil
 import logging
-import subprocess
 
-from diffoscope.tools import tool_required
+from diffoscope.exc import ContainerExtractionError
+from diffoscope.cache import DigestingWriter
 
 from .utils.file import File
 from .utils.archive import Archive
@@ -40,14 +41,15 @@ class Bzip2Container(Archive):
     def get_member_names(self):
         return [self.get_compressed_content_name('.bz2')]
 
-    @tool_required('bzip2')
     def extract(self, member_name, dest_dir):
         dest_path = self.get_path_name(dest_dir)
         logger.debug('bzip2 extracting to %s', dest_path)
-        with open(dest_path, 'wb') as fp:
-            subprocess.check_call(
-                ["bzip2", "--decompress", "--stdout", self.source.path],
-                shell=False, stdout=fp, stderr=subprocess.PIPE)
+        try:
+            with bz2.open(self.source.path, 'rb') as source, \
+                    DigestingWriter(dest_path) as target:
+                shutil.copyfileobj(source, target)
+        except (OSError, EOFError) as exc:
+            raise ContainerExtractionError(member_name, exc)
         return dest_path
 
 
@@ -21,14 +21,13 @@ import os
 import re
 import logging
 
-from diffoscope.config import Config
 from diffoscope.difference import Difference
 
 from .tar import TarContainer
 from .utils.compare import compare_files
 from .utils.file import File
 from .utils.archive import ArchiveMember
-from .utils.libarchive import LibarchiveContainer, list_libarchive
+from .utils.libarchive import LibarchiveContainer, list_archive
 from .utils.specialize import specialize
 
 try:
@@ -130,8 +129,8 @@ class DebFile(File):
         return self._control
 
     def compare_details(self, other, source=None):
-        return [Difference.from_text_readers(list_libarchive(self.path),
-                                             list_libarchive(other.path),
+        return [Difference.from_text_readers(list_archive(self),
+                                             list_archive(other),
                                              self.path, other.path, source="file list")]
 
 
@@ -169,22 +168,17 @@ class Md5sumsFile(File):
 
 
 class DebTarContainer(TarContainer):
-    def comparisons(self, other):
-        my_md5sums = {}
-        other_md5sums = {}
-
-        if self.source:
-            my_md5sums = self.source.container.source.container.source.md5sums
-        if other.source:
-            other_md5sums = other.source.container.source.container.source.md5sums
-
-        for my_member, other_member, comment in super().comparisons(other):
-            if not Config().force_details and \
-               my_member.name == other_member.name and \
-               my_md5sums.get(my_member.name, 'my') == other_md5sums.get(other_member.name, 'other'):
-                logger.debug("Skip %s: identical md5sum", my_member.name)
-                continue
-            yield my_member, other_member, comment
+    @property
+    def md5sums(self):
+        if not self.source:
+            return {}
+        return self.source.container.source.container.source.md5sums
+
+    def get_member_digest(self, member_name):
+        md5sum = self.md5sums.get(member_name)
+        if md5sum is None:
+            return None
+        return ('md5', md5sum)
 
 
 class DebDataTarFile(File):
@@ -198,6 +192,6 @@ class DebDataTarFile(File):
                isinstance(file.container.source.container.source, DebFile)
 
     def compare_details(self, other, source=None):
-        return [Difference.from_text_readers(list_libarchive(self.path),
-                                             list_libarchive(other.path),
+        return [Difference.from_text_readers(list_archive(self),
+                                             list_archive(other),
                                              self.path, other.path, source="file list")]
@@ -105,12 +105,27 @@ class DebControlContainer(Container):
     def get_member(self, member_name):
         return DebControlMember(self, member_name)
 
+    def get_member_digest(self, member_name):
+        # Only those we checked the files against when recognizing them
+        if self.source.CHECKED_CHECKSUMS is None:
+            return None
+        field, key = self.source.CHECKED_CHECKSUMS
+        for x in self.source.deb822.get(field) or ():
+            if x['name'] == member_name:
+                return (key, x[key])
+        return None
+
     def _trim_version_number(self, name):
         return self._version_re.sub('', name)
 
 
 class DebControlFile(File):
     CONTAINER_CLASS = DebControlContainer
+    EXPENSIVE_RECOGNIZES = True
+
+    # The field with the checksums that recognizes() checks the files against
+    # and their key in its entries
+    CHECKED_CHECKSUMS = None
 
     @property
     def deb822(self):
@@ -162,6 +177,8 @@ class DebControlFile(File):
 
 class DotChangesFile(DebControlFile):
     FILE_EXTENSION_SUFFIX = '.changes'
+    # What Changes.validate() checks by default
+    CHECKED_CHECKSUMS = ('Checksums-Sha1', 'sha1')
 
     @classmethod
     def recognizes(cls, file):
@@ -203,6 +220,7 @@ class DotChangesFile(DebControlFile):
 
 class DotDscFile(DebControlFile):
     FILE_EXTENSION_SUFFIX = '.dsc'
+    CHECKED_CHECKSUMS = ('Files', 'md5sum')
 
     @classmethod
     def recognizes(cls, file):
@@ -256,6 +274,7 @@ class DotBuildinfoContainer(DebControlContainer):
 class DotBuildinfoFile(DebControlFile):
     CONTAINER_CLASS = DotBuildinfoContainer
     FILE_EXTENSION_SUFFIX = '.buildinfo'
+    CHECKED_CHECKSUMS = ('Checksums-Sha256', 'sha256')
 
     @classmethod
     def recognizes(cls, file):
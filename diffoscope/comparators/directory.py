@@ -22,12 +22,13 @@ import re
 import logging
 import subprocess
 import collections
-import itertools
 
 from diffoscope.exc import RequiredToolNotFound
 from diffoscope.tools import tool_required
+from diffoscope.scheduler import check_output
 from diffoscope.config import Config
 from diffoscope.progress import Progress
+from diffoscope.parallel import parallel_starmap
 from diffoscope.difference import Difference
 
 from .binary import FilesystemFile
@@ -87,7 +88,7 @@ def lsattr(path):
     """
 
     try:
-        output = subprocess.check_output(
+        output = check_output(
             ['lsattr', '-d', path],
             shell=False,
             stderr=subprocess.STDOUT,
@@ -146,6 +147,8 @@ def compare_directories(path1, path2, source=None):
 
 
 class Directory(object):
+    EXPENSIVE_RECOGNIZES = False
+
     @classmethod
     def recognizes(cls, file):
         return file.is_directory()
@@ -180,6 +183,10 @@ class FilesystemDirectory(Directory):
         # no shortcut
         return False
 
+    @property
+    def content_digest(self):
+        return None
+
     def compare(self, other, source=None):
         differences = []
 
@@ -249,5 +256,5 @@ class DirectoryContainer(Container):
 
         return filter(
             None,
-            itertools.starmap(compare_pair, self.comparisons(other)),
+            parallel_starmap(compare_pair, self.comparisons(other)),
         )
@@ -25,6 +25,8 @@ import collections
 
 from diffoscope.exc import OutputParsingError
 from diffoscope.tools import get_tool_name, tool_required
+from diffoscope.scheduler import check_call, check_output
+from diffoscope.parallel import threaded_starmap
 from diffoscope.tempfiles import get_named_temporary_file
 from diffoscope.difference import Difference
 
@@ -167,7 +169,7 @@ class ReadElfSection(Readelf):
     @staticmethod
     def base_options():
         if not hasattr(ReadElfSection, '_base_options'):
-            output = subprocess.check_output(
+            output = check_output(
                 [get_tool_name('readelf'), '--help'],
                 shell=False,
                 stderr=subprocess.DEVNULL,
@@ -259,10 +261,12 @@ READELF_COMMANDS = (
 
 
 def _compare_elf_data(path1, path2):
-    return [
-        Difference.from_command(x, path1, path2)
+    # These are all independent, so run as many of them at once as --jobs
+    # allows.
+    return list(threaded_starmap(Difference.from_command, (
+        (x, path1, path2)
         for x in list(READELF_COMMANDS) + READELF_DEBUG_DUMP_COMMANDS
-    ]
+    )))
 
 
 def _should_skip_section(name, type):
@@ -317,6 +321,11 @@ class ElfSection(File):
     def fuzzy_hash(self):
         return None
 
+    @property
+    def content_digest(self):
+        # Our path is the whole ELF file
+        return None
+
     @classmethod
     def recognizes(cls, file):
         # No file should be recognized as an elf section
@@ -368,7 +377,7 @@ class ElfStringSection(ElfSection):
 @tool_required('readelf')
 def get_build_id(path):
     try:
-        output = subprocess.check_output(
+        output = check_output(
             [get_tool_name('readelf'), '--notes', path],
             stderr=subprocess.DEVNULL,
         )
@@ -386,7 +395,7 @@ def get_build_id(path):
 @tool_required('readelf')
 def get_debug_link(path):
     try:
-        output = subprocess.check_output(
+        output = check_output(
             [get_tool_name('readelf'), '--string-dump=.gnu_debuglink', path],
             stderr=subprocess.DEVNULL,
         )
@@ -403,6 +412,7 @@ def get_debug_link(path):
 
 class ElfContainer(Container):
     auto_diff_metadata = False
+    compare_members_in_threads = True
 
     SECTION_FLAG_MAPPING = {
         'X': ElfCodeSection,
@@ -416,7 +426,7 @@ class ElfContainer(Container):
         logger.debug("Creating ElfContainer for %s", self.source.path)
 
         cmd = [get_tool_name('readelf'), '--wide', '--section-headers', self.source.path]
-        output = subprocess.check_output(cmd, shell=False, stderr=subprocess.DEVNULL)
+        output = check_output(cmd, shell=False, stderr=subprocess.DEVNULL)
         has_debug_symbols = False
 
         try:
@@ -515,7 +525,7 @@ class ElfContainer(Container):
         os.makedirs(os.path.dirname(dest_path), exist_ok=True)
 
         def objcopy(*args):
-            subprocess.check_call(
+            check_call(
                 (get_tool_name('objcopy'),) + args,
                 shell=False,
                 stderr=subprocess.DEVNULL,
@@ -22,6 +22,7 @@ import logging
 import subprocess
 
 from diffoscope.tools import tool_required
+from diffoscope.scheduler import check_output
 from diffoscope.config import Config
 from diffoscope.difference import Difference
 
@@ -51,7 +52,7 @@ class Gifbuild(Command):
 @tool_required('identify')
 def is_image_static(image):
     try:
-        return subprocess.check_output((
+        return check_output((
             'identify',
             '-format', '%n',
             image.path,
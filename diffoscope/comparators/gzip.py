@@ -18,13 +18,15 @@
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
 import re
+import gzip
+import zlib
+import shutil
 import logging
-import subprocess
 
-from diffoscope.tools import tool_required
+from diffoscope.exc import ContainerExtractionError
+from diffoscope.cache import DigestingWriter
 from diffoscope.difference import Difference
 
-
 from .utils.file import File
 from .utils.archive import Archive
 
@@ -41,14 +43,15 @@ class GzipContainer(Archive):
     def get_member_names(self):
         return [self.get_compressed_content_name('.gz')]
 
-    @tool_required('gzip')
     def extract(self, member_name, dest_dir):
         dest_path = self.get_path_name(dest_dir)
         logger.debug('gzip extracting to %s', dest_path)
-        with open(dest_path, 'wb') as fp:
-            subprocess.check_call(
-                ["gzip", "--decompress", "--stdout", self.source.path],
-                shell=False, stdout=fp, stderr=None)
+        try:
+            with gzip.open(self.source.path, 'rb') as source, \
+                    DigestingWriter(dest_path) as target:
+                shutil.copyfileobj(source, target)
+        except (OSError, EOFError, zlib.error) as exc:
+            raise ContainerExtractionError(member_name, exc)
         return dest_path
 
 
@@ -24,6 +24,7 @@ import platform
 import subprocess
 
 from diffoscope.tools import tool_required
+from diffoscope.scheduler import check_output
 from diffoscope.profiling import profile
 from diffoscope.difference import Difference
 
@@ -70,6 +71,7 @@ class HiFile(File):
     this information is stored as big endian.
     """
     RE_FILE_EXTENSION = re.compile(r'\.(p_|dyn_)?hi$')
+    EXPENSIVE_RECOGNIZES = True
 
     @classmethod
     def recognizes(cls, file):
@@ -79,7 +81,7 @@ class HiFile(File):
         if not hasattr(HiFile, 'hi_version'):
             try:
                 with profile('command', 'ghc'):
-                    output = subprocess.check_output(
+                    output = check_output(
                         ['ghc', '--numeric-version'],
                     )
             except (OSError, subprocess.CalledProcessError):
@@ -24,6 +24,7 @@ import subprocess
 
 from diffoscope.config import Config
 from diffoscope.tools import tool_required
+from diffoscope.scheduler import check_call, check_output
 from diffoscope.tempfiles import get_named_temporary_file
 from diffoscope.difference import Difference, VisualDifference
 
@@ -89,7 +90,7 @@ def pixel_difference(image1_path, image2_path):
     compared_filename = get_named_temporary_file(suffix='.png').name
 
     try:
-        subprocess.check_call((
+        check_call((
             'compare',
             image1_path,
             image2_path,
@@ -111,7 +112,7 @@ def pixel_difference(image1_path, image2_path):
 def flicker_difference(image1_path, image2_path):
     compared_filename = get_named_temporary_file(suffix='.gif').name
 
-    subprocess.check_call((
+    check_call((
         'convert',
         '-delay', '50',
         image1_path,
@@ -129,7 +130,7 @@ def flicker_difference(image1_path, image2_path):
 
 @tool_required('identify')
 def get_image_size(image_path):
-    return subprocess.check_output((
+    return check_output((
         'identify',
         '-format', '%[h]x%[w]',
         image_path,
@@ -224,6 +225,6 @@ class ICOImageFile(File):
     def convert(file):
         result = get_named_temporary_file(suffix='.png').name
 
-        subprocess.check_call(('convert', file.path, result))
+        check_call(('convert', file.path, result))
 
         return result
@@ -21,6 +21,7 @@ import re
 import subprocess
 
 from diffoscope.tools import tool_required
+from diffoscope.scheduler import check_output
 from diffoscope.difference import Difference
 
 from .utils.file import File
@@ -30,7 +31,7 @@ from .utils.libarchive import LibarchiveContainer
 
 @tool_required('isoinfo')
 def get_iso9660_names(path):
-    return subprocess.check_output((
+    return check_output((
         'isoinfo',
         '-R',  # Always use RockRidge for names
         '-f',
@@ -27,6 +27,7 @@ from .utils.file import File
 
 class JSONFile(File):
     FILE_EXTENSION_SUFFIX = '.json'
+    EXPENSIVE_RECOGNIZES = True
 
     @classmethod
     def recognizes(cls, file):
@@ -19,9 +19,9 @@
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
 import re
-import subprocess
 
 from diffoscope.tools import tool_required
+from diffoscope.scheduler import check_output
 from diffoscope.difference import Difference
 
 from .utils.file import File
@@ -74,7 +74,7 @@ class MachoFile(File):
     @staticmethod
     @tool_required('lipo')
     def get_arch_from_macho(path):
-        lipo_output = subprocess.check_output(['lipo', '-info', path]).decode('utf-8')
+        lipo_output = check_output(['lipo', '-info', path]).decode('utf-8')
         lipo_match = MachoFile.RE_EXTRACT_ARCHS.match(lipo_output)
         if lipo_match is None:
             raise ValueError('lipo -info on Mach-O file %s did not produce expected output. Output was: %s' % path, lipo_output)
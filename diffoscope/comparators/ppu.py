@@ -25,6 +25,7 @@ import logging
 import subprocess
 
 from diffoscope.tools import tool_required
+from diffoscope.scheduler import check_output
 from diffoscope.profiling import profile
 from diffoscope.difference import Difference
 
@@ -59,6 +60,7 @@ class Ppudump(Command):
 
 class PpuFile(File):
     FILE_EXTENSION_SUFFIX = '.ppu'
+    EXPENSIVE_RECOGNIZES = True
 
     @classmethod
     def recognizes(cls, file):
@@ -72,7 +74,7 @@ class PpuFile(File):
         if not hasattr(PpuFile, 'ppu_version'):
             try:
                 with profile('command', 'ppudump'):
-                    subprocess.check_output(['ppudump', '-vh', file.path], shell=False, stderr=subprocess.STDOUT)
+                    check_output(['ppudump', '-vh', file.path], shell=False, stderr=subprocess.STDOUT)
                 PpuFile.ppu_version = ppu_version
             except subprocess.CalledProcessError as e:
                 error = e.output.decode('utf-8', errors='ignore')
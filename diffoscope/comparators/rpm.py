@@ -26,6 +26,7 @@ import binascii
 import subprocess
 
 from diffoscope.tools import tool_required
+from diffoscope.scheduler import check_call
 from diffoscope.tempfiles import get_temporary_directory
 from diffoscope.difference import Difference
 
@@ -83,6 +84,34 @@ def compare_rpm_headers(path1, path2):
     return Difference.from_text(header1, header2, path1, path2, source="header")
 
 
+def get_rpm_payload_digest(path):
+    # Only in the headers of packages built by rpm >= 4.14
+    tag = getattr(rpm, 'RPMTAG_PAYLOADDIGEST', None)
+    if tag is None:
+        return None
+
+    with get_temporary_directory() as rpmdb_dir:
+        rpm.addMacro("_dbpath", rpmdb_dir)
+        ts = rpm.TransactionSet()
+        ts.setVSFlags(-1)
+        with open(path, 'r') as f:
+            try:
+                hdr = ts.hdrFromFdno(f)
+            except rpm.error as e:
+                logger.debug("reading rpm header failed: %s", str(e))
+                return None
+
+    digests = hdr[tag]
+    if not digests:
+        return None
+
+    return (
+        'payload',
+        hdr[rpm.RPMTAG_PAYLOADDIGESTALGO],
+        tuple(digests),
+    )
+
+
 class RpmContainer(Archive):
     def open_archive(self):
         return self
@@ -93,13 +122,19 @@ class RpmContainer(Archive):
     def get_member_names(self):
         return ['content']
 
+    def get_member_digest(self, member_name):
+        # The (compressed) payload is what rpm2cpio gives us, decompressed
+        if not hasattr(self, '_payload_digest'):
+            self._payload_digest = get_rpm_payload_digest(self.source.path)
+        return self._payload_digest
+
     @tool_required('rpm2cpio')
     def extract(self, member_name, dest_dir):
         assert member_name == 'content'
         dest_path = os.path.join(dest_dir, 'content')
         cmd = ['rpm2cpio', self.source.path]
         with open(dest_path, 'wb') as dest:
-            subprocess.check_call(cmd, shell=False, stdout=dest, stderr=subprocess.PIPE)
+            check_call(cmd, shell=False, stdout=dest, stderr=subprocess.PIPE)
         return dest_path
 
 
@@ -27,6 +27,7 @@ import subprocess
 import collections
 
 from diffoscope.tools import tool_required
+from diffoscope.scheduler import check_output
 from diffoscope.difference import Difference
 from diffoscope.tempfiles import get_temporary_directory
 
@@ -89,7 +90,7 @@ class SquashfsMember(ArchiveMember):
 class SquashfsRegularFile(SquashfsMember):
     # Example line:
     # -rw-r--r-- user/group   446 2015-06-24 14:49 squashfs-root/text
-    LINE_RE = re.compile(r'^\S+\s+\S+\s+\S+\s+\S+\s+\S+\s+(?P<member_name>.*)$')
+    LINE_RE = re.compile(r'^\S+\s+\S+\s+(?P<size>\d+)\s+\S+\s+\S+\s+(?P<member_name>.*)$')
 
     @staticmethod
     def parse(line):
@@ -247,16 +248,24 @@ class SquashfsContainer(Archive):
         self.ensure_unpacked()
         return self._members.keys()
 
+    def get_member_size(self, member):
+        self.ensure_unpacked()
+        try:
+            return self._sizes[member._name]
+        except KeyError:
+            return super().get_member_size(member)
+
     def ensure_unpacked(self):
         if hasattr(self, '_members'):
             return
 
         self._members = collections.OrderedDict()
+        self._sizes = {}
         self._temp_dir = get_temporary_directory().name
 
         logger.debug("Extracting %s to %s", self.source.path, self._temp_dir)
 
-        output = subprocess.check_output((
+        output = check_output((
             'unsquashfs',
             '-n',
             '-f',
@@ -290,6 +299,11 @@ class SquashfsContainer(Archive):
             # Pop to avoid duplicating member name in the key and the value
             member_name = kwargs.pop('member_name')
 
+            # Keep the size of regular files out of the arguments of cls
+            size = kwargs.pop('size', None)
+            if size is not None:
+                self._sizes[member_name] = int(size)
+
             self._members[member_name] = (cls, kwargs)
 
         logger.debug(
@@ -22,7 +22,7 @@ import re
 from diffoscope.difference import Difference
 
 from .utils.file import File
-from .utils.libarchive import LibarchiveContainer, list_libarchive
+from .utils.libarchive import LibarchiveContainer, list_archive
 
 
 class TarContainer(LibarchiveContainer):
@@ -34,6 +34,6 @@ class TarFile(File):
     FILE_TYPE_RE = re.compile(r'\btar archive\b')
 
     def compare_details(self, other, source=None):
-        return [Difference.from_text_readers(list_libarchive(self.path),
-                                             list_libarchive(other.path),
+        return [Difference.from_text_readers(list_archive(self),
+                                             list_archive(other),
                                              self.path, other.path, source="file list")]
@@ -18,11 +18,14 @@
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
 import io
+import os
 import abc
-import logging
 import shlex
+import logging
 import subprocess
-import threading
+import collections
+
+from diffoscope.scheduler import Scheduler
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +37,11 @@ class Command(object, metaclass=abc.ABCMeta):
     def start(self):
         logger.debug("Executing %s", ' '.join([shlex.quote(x) for x in self.cmdline()]))
         self._stdin = self.stdin()
+        # Unless we are part of a larger job (eg. Difference.from_command)
+        # the command takes a job slot of its own until wait() is called.
+        self._slot = None
+        if Scheduler().current() is None:
+            self._slot = Scheduler().acquire()
         # "stdin" used to be a feeder but we didn't need the functionality so
         # it was simplified into the current form. it can be recovered from git
         # the extra functionality is needed in the future. alternatively,
@@ -46,11 +54,19 @@ class Command(object, metaclass=abc.ABCMeta):
                                          stdin=self._stdin,
                                          stdout=subprocess.PIPE,
                                          stderr=subprocess.PIPE)
+        self._stdout_chunks = collections.deque()
         self._stderr = io.BytesIO()
+        self._stderr_partial = b''
         self._stderr_line_count = 0
-        self._stderr_reader = threading.Thread(target=self._read_stderr)
-        self._stderr_reader.daemon = True
-        self._stderr_reader.start()
+        # Our output is read by whoever runs the diff(1) process (see
+        # diff.FeederPipe) as it becomes available, so that we don't need
+        # threads to read stdout and stderr at the same time.
+        self._pipes = {
+            self._process.stdout.fileno(): self._read_stdout,
+            self._process.stderr.fileno(): self._read_stderr,
+        }
+        for fd in self._pipes:
+            os.set_blocking(fd, False)
 
     @property
     def path(self):
@@ -59,6 +75,9 @@ class Command(object, metaclass=abc.ABCMeta):
     def stdin(self):
         return None
 
+    def has_stdin(self):
+        return type(self).stdin is not Command.stdin
+
     @abc.abstractmethod
     def cmdline(self):
         raise NotImplementedError()
@@ -73,6 +92,9 @@ class Command(object, metaclass=abc.ABCMeta):
         # Assume command output is utf-8 by default
         return line
 
+    def has_filter(self):
+        return type(self).filter is not Command.filter
+
     def poll(self):
         return self._process.poll()
 
@@ -80,7 +102,15 @@ class Command(object, metaclass=abc.ABCMeta):
         return self._process.terminate()
 
     def wait(self):
-        self._stderr_reader.join()
+        # Collect whatever is left on stderr; stdout has either been read to
+        # the end or we are no longer interested in it.
+        stderr_fd = self._process.stderr.fileno()
+        os.set_blocking(stderr_fd, True)
+        while stderr_fd in self._pipes:
+            self.on_readable(stderr_fd)
+        self._process.stdout.close()
+        self._process.stderr.close()
+
         returncode = self._process.wait()
         logger.debug(
             "%s returned (exit code: %d)",
@@ -89,18 +119,56 @@ class Command(object, metaclass=abc.ABCMeta):
         )
         if self._stdin:
             self._stdin.close()
+        if self._slot is not None:
+            Scheduler().release(self._slot)
+            self._slot = None
         return returncode
 
+    def filenos(self):
+        return list(self._pipes)
+
+    def on_readable(self, fd):
+        try:
+            data = os.read(fd, 65536)
+        except BlockingIOError:
+            return
+        if not data:
+            self._pipes.pop(fd)(b'')
+            return
+        self._pipes[fd](data)
+
+    def _split_lines(self, partial, data):
+        if not data:
+            return [partial] if partial else [], b''
+        lines = (partial + data).split(b'\n')
+        partial = lines.pop()
+        return [x + b'\n' for x in lines], partial
+
+    def _read_stdout(self, data):
+        if data:
+            self._stdout_chunks.append(data)
+
     MAX_STDERR_LINES = 50
 
-    def _read_stderr(self):
-        for line in iter(self._process.stderr.readline, b''):
+    def _read_stderr(self, data):
+        lines, self._stderr_partial = self._split_lines(
+            self._stderr_partial,
+            data,
+        )
+        for line in lines:
             self._stderr_line_count += 1
             if self._stderr_line_count <= Command.MAX_STDERR_LINES:
                 self._stderr.write(line)
-        if self._stderr_line_count > Command.MAX_STDERR_LINES:
+        if not data and self._stderr_line_count > Command.MAX_STDERR_LINES:
             self._stderr.write('[ {} lines ignored ]\n'.format(self._stderr_line_count - Command.MAX_STDERR_LINES).encode('utf-8'))
-        self._process.stderr.close()
+
+    def use_cached_output(self, stderr):
+        """
+        Don't run the command as its output was found in the cache, along
+        with what it wrote to `stderr`.
+        """
+
+        self._stderr = io.BytesIO(stderr)
 
     @property
     def stderr_content(self):
@@ -112,4 +180,32 @@ class Command(object, metaclass=abc.ABCMeta):
 
     @property
     def stdout(self):
-        return self._process.stdout
+        """
+        Iterate over the lines of our output, yielding ourselves whenever we
+        need to wait for more.
+        """
+
+        partial = b''
+        for data in self.stdout_chunks:
+            if not isinstance(data, bytes):
+                yield data
+                continue
+            lines, partial = self._split_lines(partial, data)
+            yield from lines
+        if partial:
+            yield partial
+
+    @property
+    def stdout_chunks(self):
+        """
+        Iterate over our output as it was read, yielding ourselves whenever
+        we need to wait for more.
+        """
+
+        stdout_fd = self._process.stdout.fileno()
+        while True:
+            while self._stdout_chunks:
+                yield self._stdout_chunks.popleft()
+            if stdout_fd not in self._pipes:
+                return
+            yield self
@@ -23,12 +23,15 @@ import sys
 import logging
 import binascii
 
+from diffoscope.diff import parse_unified_diff
 from diffoscope.tools import tool_required
 from diffoscope.exc import RequiredToolNotFound
 from diffoscope.config import Config
-from diffoscope.excludes import any_excluded
+from diffoscope.hexdiff import HexDiff, open_data
+from diffoscope.excludes import any_excluded, command_excluded
 from diffoscope.profiling import profile
 from diffoscope.difference import Difference
+from diffoscope.resultcache import ResultCache, MISSING
 
 from ..missing_file import MissingFile
 
@@ -93,6 +96,22 @@ def compare_files(file1, file2, source=None, diff_content_only=False):
 
     specialize(file1)
     specialize(file2)
+
+    key = ResultCache().key(file1, file2, source)
+    if key is not None:
+        difference = ResultCache().get(key, file1, file2)
+        if difference is not MISSING:
+            return difference
+
+    difference = compare_specialized_files(file1, file2, source)
+
+    if key is not None:
+        ResultCache().put(key, file1, file2, difference)
+
+    return difference
+
+
+def compare_specialized_files(file1, file2, source=None):
     if isinstance(file1, MissingFile):
         file1.other_file = file2
     elif isinstance(file2, MissingFile):
@@ -113,9 +132,22 @@ def bail_if_non_existing(*paths):
 
 
 def compare_binary_files(file1, file2, source=None):
+    if source is None:
+        source = [file1.name, file2.name]
+
+    # Like the output of xxd itself, ours is left out with --exclude-command
+    if xxd_excluded(file1.path, file2.path):
+        return None
+
+    try:
+        with open_data(file1.path) as data1, open_data(file2.path) as data2:
+            return compare_hexdumps(data1, data2, file1, file2, source)
+    except (OSError, ValueError) as exc:
+        # eg. not a regular file, so it cannot be mapped into memory
+        logger.debug("Unable to compare %s and %s in-process: %s",
+                     file1.path, file2.path, exc)
+
     try:
-        if source is None:
-            source = [file1.name, file2.name]
         return Difference.from_command(
             Xxd, file1.path, file2.path,
             source=source, has_internal_linenos=True)
@@ -126,6 +158,47 @@ def compare_binary_files(file1, file2, source=None):
         return Difference.from_text(hexdump1, hexdump2, file1.name, file2.name, source, comment)
 
 
+def xxd_excluded(*paths):
+    try:
+        return any(
+            command_excluded(Xxd(x).shell_cmdline())
+            for x in paths if x != '/dev/null'
+        )
+    except RequiredToolNotFound:
+        return False
+
+
+def compare_hexdumps(data1, data2, file1, file2, source):
+    """
+    Compare the data of two files in the format of xxd(1), only formatting
+    the parts which differ.
+    """
+
+    hexdiff = HexDiff(data1, data2, Config().max_diff_input_lines)
+    with profile('compare_hexdumps', file1):
+        unified_diff = parse_unified_diff(hexdiff)
+
+    difference = None
+    if unified_diff:
+        difference = Difference(
+            unified_diff,
+            file1.name,
+            file2.name,
+            source=source,
+            has_internal_linenos=True,
+        )
+
+    if hexdiff.truncated_at is not None:
+        if difference is None:
+            difference = Difference(None, file1.name, file2.name, source=source)
+        difference.add_comment(
+            "Differences after offset 0x{:x} not shown; see "
+            "--max-diff-input-lines".format(hexdiff.truncated_at),
+        )
+
+    return difference
+
+
 def hexdump_fallback(path):
     hexdump = io.StringIO()
     with open(path, 'rb') as f:
@@ -28,6 +28,7 @@ from diffoscope.config import Config
 from diffoscope.difference import Difference
 from diffoscope.excludes import filter_excludes
 from diffoscope.progress import Progress
+from diffoscope.parallel import parallel_starmap, threaded_starmap
 
 from ..missing_file import MissingFile
 
@@ -41,6 +42,9 @@ logger = logging.getLogger(__name__)
 
 class Container(object, metaclass=abc.ABCMeta):
     auto_diff_metadata = True
+    # Compare members in threads rather than in worker processes. Only safe if
+    # comparing them just runs external tools and never recurses further.
+    compare_members_in_threads = False
 
     def __new__(cls, source):
         if isinstance(source, MissingFile):
@@ -119,12 +123,37 @@ class Container(object, metaclass=abc.ABCMeta):
 
         return container.lookup_file(*remainings)
 
+    def get_member_size(self, member):
+        """
+        Return the size of `member` to weigh it in the progress bar.
+
+        Containers which know the sizes of their members from the metadata
+        of the archive should override this, as looking at `member.path`
+        extracts the member. The members are then first extracted when they
+        are compared, with --jobs in a worker process, so containers which
+        extract all of them at once must do so in comparisons() instead, as
+        LibarchiveContainer does.
+        """
+        return path_apparent_size(member.path)
+
+    def get_member_digest(self, member_name):
+        """
+        Return the checksum of the contents of a member as the container
+        itself lists it (eg. the md5sums of a .deb), or None.
+
+        It is a tuple starting with the kind of checksum, and members with
+        the same one are not compared at all, so this should not need to
+        extract the member. Weak checksums such as the CRC32 of zip files
+        can't tell that members are the same and must not be used.
+        """
+        return None
+
     def get_adjusted_members_sizes(self):
         for name, member in self.get_adjusted_members():
             if member.is_directory():
                 size = 4096  # default "size" of a directory
             else:
-                size = path_apparent_size(member.path)
+                size = self.get_member_size(member)
             yield name, (member, size)
 
     def comparisons(self, other):
@@ -134,6 +163,14 @@ class Container(object, metaclass=abc.ABCMeta):
         # TODO: progress could be a bit more accurate here, give more weight to fuzzy-hashed files
         # TODO: merge DirectoryContainer.comparisons() into this
 
+        def has_same_digest(my_member, other_member):
+            if Config().force_details:
+                return False
+            digest = self.get_member_digest(my_member.name)
+            if digest is None:
+                return False
+            return digest == other.get_member_digest(other_member.name)
+
         with Progress(total_size) as p:
             def prep_yield(my_name, other_name, comment=NO_COMMENT):
                 my_member, my_size = my_members.pop(my_name)
@@ -141,17 +178,26 @@ class Container(object, metaclass=abc.ABCMeta):
                 p.begin_step(my_size + other_size, msg=my_member.progress_name)
                 return my_member, other_member, comment
 
+            def prep_yield_unless_same(my_name, other_name):
+                my_member, other_member, comment = prep_yield(my_name, other_name)
+                if has_same_digest(my_member, other_member):
+                    logger.debug("Skip %s: identical checksum", my_member.name)
+                    return []
+                return [(my_member, other_member, comment)]
+
             # if both containers contain 1 element, compare these
             if len(my_members) == 1 and len(other_members) == 1:
-                yield prep_yield(next(iter(my_members.keys())),
-                                 next(iter(other_members.keys())))
+                yield from prep_yield_unless_same(
+                    next(iter(my_members.keys())),
+                    next(iter(other_members.keys())),
+                )
                 return
 
             other_names = set(other_members.keys())
             # keep it sorted like my_members
             both_names = [name for name in my_members.keys() if name in other_names]
             for name in both_names:
-                yield prep_yield(name, name)
+                yield from prep_yield_unless_same(name, name)
 
             for my_name, other_name, score in self.perform_fuzzy_matching(my_members, other_members):
                 comment = "Files similar despite different names" \
@@ -178,7 +224,12 @@ class Container(object, metaclass=abc.ABCMeta):
                 difference.add_comment(comment)
             return difference
 
-        return filter(None, itertools.starmap(compare_pair, self.comparisons(other)))
+        if self.compare_members_in_threads:
+            starmap = threaded_starmap
+        else:
+            starmap = parallel_starmap
+
+        return filter(None, starmap(compare_pair, self.comparisons(other)))
 
 
 class MissingContainer(Container):
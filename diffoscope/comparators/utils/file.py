@@ -26,7 +26,11 @@ import subprocess
 
 from diffoscope.exc import RequiredToolNotFound, OutputParsingError, \
     ContainerExtractionError
+from diffoscope.cache import file_digest, new_digest, remember_digest
 from diffoscope.tools import tool_required
+from diffoscope.hexdiff import open_data
+from diffoscope.parallel import parallel_starmap
+from diffoscope.scheduler import call
 from diffoscope.config import Config
 from diffoscope.profiling import profile
 from diffoscope.difference import Difference
@@ -38,6 +42,9 @@ except ImportError:  # noqa
 
 SMALL_FILE_THRESHOLD = 65536  # 64 kiB
 
+FUZZY_HASH_CHUNK_SIZE = 1 << 20  # 1 MiB
+FUZZY_HASH_MIN_BATCH_SIZE = 1 << 22  # 4 MiB
+
 logger = logging.getLogger(__name__)
 
 
@@ -57,6 +64,100 @@ def path_apparent_size(path=".", visited=None):
     return sum(visited.values())
 
 
+def compute_fuzzy_hash(path):
+    """
+    Return the TLSH digest of the contents of `path`, or None if there is
+    not enough of them, and their digest computed while reading them.
+    """
+
+    # tlsh is not meaningful with files smaller than 512 bytes
+    if os.stat(path).st_size < 512:
+        return None, None
+
+    h = tlsh.Tlsh()
+    digest = new_digest()
+    with open_data(path) as data:
+        for offset in range(0, len(data), FUZZY_HASH_CHUNK_SIZE):
+            buf = data[offset:offset + FUZZY_HASH_CHUNK_SIZE]
+            h.update(buf)
+            digest.update(buf)
+    h.final()
+
+    try:
+        return h.hexdigest(), digest.hexdigest()
+    except ValueError:
+        # File must contain a certain amount of randomness.
+        return None, digest.hexdigest()
+
+
+def _compute_fuzzy_hashes(paths):
+    result = []
+    for path in paths:
+        try:
+            result.append(compute_fuzzy_hash(path))
+        except OSError:
+            result.append(None)
+    return result
+
+
+def prefetch_fuzzy_hashes(files):
+    """
+    Compute the fuzzy hashes of `files` ahead of File.fuzzy_hash in parallel,
+    when more than one job is configured.
+
+    tlsh does not release the GIL, so this uses worker processes and only
+    sends back the hashes.
+    """
+
+    jobs = Config().jobs
+    if tlsh is None or jobs <= 1:
+        return
+
+    pending = []
+    for file in files:
+        # Only files using our fuzzy_hash, eg. not ELF sections
+        if file.is_directory() or hasattr(file, '_fuzzy_hash') or \
+                type(file).fuzzy_hash is not File.fuzzy_hash:
+            continue
+        try:
+            # Extract it here, as what workers extract is removed when done
+            path = file.path
+            size = os.path.getsize(path)
+        except Exception:
+            # Leave it to File.fuzzy_hash
+            continue
+        pending.append((file, path, size))
+
+    # Spread the work over a few batches per job, unless there is so little
+    # that starting workers would take longer.
+    batch_size = max(
+        sum(x[2] for x in pending) / (jobs * 4),
+        FUZZY_HASH_MIN_BATCH_SIZE,
+    )
+    batches, batch, size = [], [], 0
+    for x in pending:
+        batch.append(x)
+        size += x[2]
+        if size >= batch_size:
+            batches.append(batch)
+            batch, size = [], 0
+    if batch:
+        batches.append(batch)
+    if len(batches) <= 1:
+        return
+
+    results = parallel_starmap(_compute_fuzzy_hashes, (
+        ([path for _, path, _ in batch],) for batch in batches
+    ))
+    for batch, hashes in zip(batches, results):
+        for (file, path, _), result in zip(batch, hashes):
+            if result is None:
+                continue
+            file._fuzzy_hash, digest = result
+            if digest is not None:
+                remember_digest(path, digest)
+
+
 def _run_tests(fold, tests):
     return fold(t(y, x) for x, t, y in tests)
 
@@ -114,6 +215,12 @@ class File(object, metaclass=abc.ABCMeta):
     FILE_TYPE_RE = None
     FILE_TYPE_HEADER_PREFIX = None
 
+    # Set if recognizes() does more than the cheap tests below, eg. parse the
+    # whole file or run a tool, after them. specialize() then keeps its result
+    # so that it is never tried twice on the same file, eg. when the file is
+    # specialized again before being compared.
+    EXPENSIVE_RECOGNIZES = False
+
     @classmethod
     def recognizes(cls, file):
         """Check if a file's type matches the one represented by this class.
@@ -250,22 +357,27 @@ class File(object, metaclass=abc.ABCMeta):
         @property
         def fuzzy_hash(self):
             if not hasattr(self, '_fuzzy_hash'):
-                # tlsh is not meaningful with files smaller than 512 bytes
-                if os.stat(self.path).st_size >= 512:
-                    h = tlsh.Tlsh()
-                    with open(self.path, 'rb') as f:
-                        for buf in iter(lambda: f.read(32768), b''):
-                            h.update(buf)
-                    h.final()
-                    try:
-                        self._fuzzy_hash = h.hexdigest()
-                    except ValueError:
-                        # File must contain a certain amount of randomness.
-                        self._fuzzy_hash = None
-                else:
-                    self._fuzzy_hash = None
+                self._fuzzy_hash, digest = compute_fuzzy_hash(self.path)
+                if digest is not None:
+                    remember_digest(self.path, digest)
             return self._fuzzy_hash
 
+    @property
+    def content_digest(self):
+        """
+        The digest of the contents of the file, or None if they are not known
+        to be exactly what is at its path.
+        """
+
+        if self.is_directory() or self.is_symlink() or self.is_device():
+            return None
+        if not os.path.isfile(self.path) or os.path.islink(self.path):
+            return None
+        try:
+            return file_digest(self.path)
+        except OSError:
+            return None
+
     @abc.abstractmethod
     def is_directory():
         raise NotImplementedError()
@@ -335,7 +447,17 @@ class File(object, metaclass=abc.ABCMeta):
             # files not readable (e.g. broken symlinks) or something else,
             # just assume they are different
             return False
-        if my_size == other_size and my_size <= SMALL_FILE_THRESHOLD:
+        if my_size != other_size:
+            return False
+
+        # The digests are remembered, so comparing the same file again (or
+        # looking it up in a cache) is free.
+        my_digest = self.content_digest
+        other_digest = other.content_digest
+        if my_digest is not None and other_digest is not None:
+            return my_digest == other_digest
+
+        if my_size <= SMALL_FILE_THRESHOLD:
             try:
                 with profile('command', 'cmp (internal)'):
                     with open(self.path, 'rb') as file1, open(other.path, 'rb') as file2:
@@ -349,7 +471,7 @@ class File(object, metaclass=abc.ABCMeta):
 
     @tool_required('cmp')
     def cmp_external(self, other):
-        return subprocess.call(
+        return call(
             ('cmp', '-s', self.path, other.path),
             shell=False,
             close_fds=True,
@@ -17,11 +17,15 @@
 # You should have received a copy of the GNU General Public License
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
+import bisect
 import logging
-import operator
+import functools
+import itertools
 
 from diffoscope.config import Config
 
+from .file import prefetch_fuzzy_hashes
+
 try:
     import tlsh
 except ImportError:  # noqa
@@ -29,26 +33,214 @@ except ImportError:  # noqa
 
 logger = logging.getLogger(__name__)
 
+# TLSH digests with 128 buckets and a 1-byte checksum, optionally prefixed by
+# their version.
+TLSH_VERSION_PREFIX = 'T1'
+TLSH_HEX_LENGTH = 70
+
+# Sum of the four 2-bit buckets in each byte of the body of a digest
+BUCKETS_SUM = [
+    sum((x >> shift) & 0b11 for shift in (0, 2, 4, 6)) for x in range(256)
+]
+
+
+def parse_tlsh(digest):
+    """
+    Return the length, quartile ratios and sum of the buckets of a TLSH
+    digest, or None if it is not in a format we know.
+    """
+
+    if digest.startswith(TLSH_VERSION_PREFIX):
+        digest = digest[len(TLSH_VERSION_PREFIX):]
+    if len(digest) != TLSH_HEX_LENGTH:
+        return None
+
+    try:
+        data = bytes.fromhex(digest)
+    except ValueError:
+        return None
+
+    # Nibbles of the length are swapped, those of the ratios are not
+    length = ((data[1] & 0xf) << 4) | (data[1] >> 4)
+    q1, q2 = data[2] >> 4, data[2] & 0xf
+    return length, q1, q2, sum(BUCKETS_SUM[x] for x in data[3:])
+
+
+def _mod_diff(x, y, r):
+    d = abs(x - y)
+    return min(d, r - d)
+
+
+def _length_diff(d):
+    d = _mod_diff(0, d, 256)
+    return d if d <= 1 else d * 12
+
+
+def _ratio_diff(d):
+    d = _mod_diff(0, d, 16)
+    return d if d <= 1 else (d - 1) * 12
+
+
+@functools.lru_cache()
+def header_offsets(threshold):
+    """
+    Return how far apart the length and quartile ratios in the headers of
+    two digests can be for tlsh.diff() to add less than `threshold` for them,
+    as (penalty, length offset, q1 offset, q2 offset), from the lowest.
+    """
+
+    lengths = [(_length_diff(x), x) for x in range(256)]
+    ratios = [(_ratio_diff(x), x) for x in range(16)]
+
+    return sorted(
+        (x + y + z, length, q1, q2)
+        for x, length in lengths if x < threshold
+        for y, q1 in ratios if x + y < threshold
+        for z, q2 in ratios if x + y + z < threshold
+    )
+
+
+class FuzzyIndex(object):
+    """
+    Finds the closest of a set of TLSH digests to another one.
+
+    tlsh.diff() adds up penalties for the differences in the lengths and
+    quartile ratios in the headers of the digests, whether their checksums
+    match and the distance between each of their buckets. The latter is at
+    least the difference of the sums of the buckets, so grouping the digests
+    by header and sorting them by that sum lets us only look at those which
+    could possibly be closer than the best one found so far.
+    """
+
+    def __init__(self, digests):
+        # Candidates are preferred in the order they are given
+        self.entries = [(i, name, x) for i, (name, x) in enumerate(digests)]
+        self.removed = set()
+
+        # {(length, q1, q2): ([sums], [entries])}
+        self.groups = {}
+        # Digests we cannot parse are always compared
+        self.others = []
+
+        parsed = []
+        for entry in self.entries:
+            header = parse_tlsh(entry[2])
+            if header is None:
+                self.others.append(entry)
+            else:
+                parsed.append((header, entry))
+
+        parsed.sort(key=lambda x: (x[0], x[1][0]))
+        for (length, q1, q2, total), entry in parsed:
+            sums, entries = self.groups.setdefault((length, q1, q2), ([], []))
+            sums.append(total)
+            entries.append(entry)
+
+    def remove(self, name):
+        self.removed.add(name)
+
+    def closest(self, digest, threshold):
+        """
+        Return the score and name of the closest digest with a score below
+        `threshold`, or None.
+        """
+
+        best = None
+
+        def consider(entry):
+            nonlocal best
+            i, name, other = entry
+            if name in self.removed:
+                return
+            score = tlsh.diff(digest, other)
+            if score < threshold and (best is None or (score, i) < best[:2]):
+                best = score, i, name
+
+        def promising(bound):
+            # Scores are integers, and equal ones may come earlier
+            return bound < threshold and (best is None or bound <= best[0])
+
+        for entry in self.others:
+            consider(entry)
+
+        header = parse_tlsh(digest)
+        if header is None:
+            for entry in self.entries:
+                consider(entry)
+        else:
+            total = header[3]
+            for bound, sums, entries in self.groups_near(header, threshold):
+                if not promising(bound):
+                    break
+                # Work outwards from the digests with the same sum
+                start = bisect.bisect_left(sums, total)
+                for i in range(start, len(sums)):
+                    if not promising(bound + sums[i] - total):
+                        break
+                    consider(entries[i])
+                for i in range(start - 1, -1, -1):
+                    if not promising(bound + total - sums[i]):
+                        break
+                    consider(entries[i])
+
+        if best is None:
+            return None
+        return best[0], best[2]
+
+    def groups_near(self, header, threshold):
+        """
+        Yield the groups of digests whose headers alone add less than
+        `threshold` to the score, from the lowest, with that penalty.
+        """
+
+        length, q1, q2, _ = header
+        offsets = header_offsets(threshold)
+
+        if len(offsets) > len(self.groups):
+            # Cheaper to look at all of them
+            groups = sorted(
+                (_length_diff(x - length) + _ratio_diff(y - q1) +
+                 _ratio_diff(z - q2), x, y, z)
+                for x, y, z in self.groups
+            )
+            for bound, x, y, z in groups:
+                if bound >= threshold:
+                    break
+                yield (bound,) + self.groups[x, y, z]
+            return
+
+        for bound, x, y, z in offsets:
+            try:
+                group = self.groups[
+                    (length + x) % 256, (q1 + y) % 16, (q2 + z) % 16,
+                ]
+            except KeyError:
+                continue
+            yield (bound,) + group
+
 
 def perform_fuzzy_matching(members1, members2):
     if tlsh is None or Config().fuzzy_threshold == 0:
         return
-    already_compared = set()
     # Perform local copies because they will be modified by consumer
     members1 = dict(members1)
     members2 = dict(members2)
+    prefetch_fuzzy_hashes(
+        file for file, _ in itertools.chain(members1.values(), members2.values())
+    )
+    index = None
     for name1, (file1, _) in members1.items():
         if file1.is_directory() or not file1.fuzzy_hash:
             continue
-        comparisons = []
-        for name2, (file2, _) in members2.items():
-            if name2 in already_compared or file2.is_directory() or not file2.fuzzy_hash:
-                continue
-            comparisons.append((tlsh.diff(file1.fuzzy_hash, file2.fuzzy_hash), name2))
-        if comparisons:
-            comparisons.sort(key=operator.itemgetter(0))
-            score, name2 = comparisons[0]
+        if index is None:
+            index = FuzzyIndex(
+                (name2, file2.fuzzy_hash)
+                for name2, (file2, _) in members2.items()
+                if not file2.is_directory() and file2.fuzzy_hash
+            )
+        match = index.closest(file1.fuzzy_hash, Config().fuzzy_threshold)
+        if match is not None:
+            score, name2 = match
             logger.debug('fuzzy top match %s %s: %d difference score', name1, name2, score)
-            if score < Config().fuzzy_threshold:
-                yield name1, name2, score
-                already_compared.add(name2)
+            yield name1, name2, score
+            index.remove(name2)
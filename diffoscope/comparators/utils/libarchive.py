@@ -26,6 +26,8 @@ import libarchive
 import collections
 
 from diffoscope.exc import ContainerExtractionError
+from diffoscope.cache import DigestingWriter, new_digest
+from diffoscope.config import Config
 from diffoscope.excludes import any_excluded
 from diffoscope.tempfiles import get_temporary_directory
 
@@ -73,30 +75,103 @@ libarchive.ArchiveEntry.pathname = property(lambda self: libarchive.ffi.entry_pa
 def list_libarchive(path):
     with libarchive.file_reader(path) as archive:
         for entry in archive:
-            if entry.isblk or entry.ischr:
-                size_or_dev = '{major:>3},{minor:>3}'.format(major=entry.rdevmajor, minor=entry.rdevminor)
-            else:
-                size_or_dev = entry.size
-            mtime = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(entry.mtime)) + '.{:06d}'.format(entry.mtime_nsec // 1000)
-            if entry.issym:
-                name_and_link = '{entry.name} -> {entry.linkname}'.format(entry=entry)
-            else:
-                name_and_link = entry.name
-            if entry.uname:
-                user = '{user:<8} {uid:>7}'.format(user=entry.uname.decode('utf-8', errors='surrogateescape'), uid='({})'.format(entry.uid))
-            else:
-                user = entry.uid
-            if entry.gname:
-                group = '{group:<8} {gid:>7}'.format(group=entry.gname.decode('utf-8', errors='surrogateescape'), gid='({})'.format(entry.gid))
-            else:
-                group = entry.gid
-            yield '{strmode} {entry.nlink:>3} {user:>8} {group:>8} {size_or_dev:>8} {mtime:>8} {name_and_link}\n'.format(strmode=entry.strmode.decode('us-ascii'), entry=entry, user=user, group=group, size_or_dev=size_or_dev, mtime=mtime, name_and_link=name_and_link)
+            yield format_entry(entry)
+
+
+def list_archive(file):
+    """
+    Like list_libarchive() for the path of `file`, but using what its container
+    found when going through the archive anyway, if it has one.
+    """
+
+    container = file.as_container
+    if isinstance(container, LibarchiveContainer):
+        return iter(container.get_listing())
+
+    return list_libarchive(file.path)
+
+
+def format_entry(entry):
+    if entry.isblk or entry.ischr:
+        size_or_dev = '{major:>3},{minor:>3}'.format(major=entry.rdevmajor, minor=entry.rdevminor)
+    else:
+        size_or_dev = entry.size
+    mtime = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(entry.mtime)) + '.{:06d}'.format(entry.mtime_nsec // 1000)
+    if entry.issym:
+        name_and_link = '{entry.name} -> {entry.linkname}'.format(entry=entry)
+    else:
+        name_and_link = entry.name
+    if entry.uname:
+        user = '{user:<8} {uid:>7}'.format(user=entry.uname.decode('utf-8', errors='surrogateescape'), uid='({})'.format(entry.uid))
+    else:
+        user = entry.uid
+    if entry.gname:
+        group = '{group:<8} {gid:>7}'.format(group=entry.gname.decode('utf-8', errors='surrogateescape'), gid='({})'.format(entry.gid))
+    else:
+        group = entry.gid
+    return '{strmode} {entry.nlink:>3} {user:>8} {group:>8} {size_or_dev:>8} {mtime:>8} {name_and_link}\n'.format(strmode=entry.strmode.decode('us-ascii'), entry=entry, user=user, group=group, size_or_dev=size_or_dev, mtime=mtime, name_and_link=name_and_link)
+
+
+# What we keep of each entry after going through the archive
+LibarchiveEntry = collections.namedtuple('LibarchiveEntry', (
+    'pathname',
+    'isdir',
+    'issym',
+    'isblk',
+    'ischr',
+    'linkpath',
+    'mode',
+    'rdevmajor',
+    'rdevminor',
+    'size',
+))
+
+
+def snapshot_entry(entry):
+    isdev = entry.isblk or entry.ischr
+    return LibarchiveEntry(
+        pathname=entry.pathname,
+        isdir=entry.isdir,
+        issym=entry.issym,
+        isblk=entry.isblk,
+        ischr=entry.ischr,
+        linkpath=entry.linkpath if entry.issym else None,
+        mode=entry.mode,
+        rdevmajor=entry.rdevmajor if isdev else None,
+        rdevminor=entry.rdevminor if isdev else None,
+        size=entry.size,
+    )
 
 
 class LibarchiveMember(ArchiveMember):
     def __init__(self, archive, entry):
         super().__init__(archive, entry.pathname)
 
+    def is_regular(self):
+        return not (self.is_directory() or self.is_symlink() or
+                    self.is_device())
+
+    @property
+    def content_digest(self):
+        # We may have only read it to compare it with the other side
+        if self.is_regular():
+            digest = self.container.get_read_digest(self.name)
+            if digest is not None:
+                return digest
+        return super().content_digest
+
+    def has_same_content_as(self, other):
+        # Don't extract members just to find they are the same
+        if self.is_regular() and isinstance(other, LibarchiveMember) and \
+                other.is_regular():
+            digests = (
+                self.container.get_read_digest(self.name),
+                other.container.get_read_digest(other.name),
+            )
+            if None not in digests:
+                return digests[0] == digests[1]
+        return super().has_same_content_as(other)
+
     def is_directory(self):
         return False
 
@@ -169,25 +244,47 @@ class LibarchiveContainer(Archive):
         pass
 
     def get_member_names(self):
-        self.ensure_unpacked()
+        self.ensure_scanned()
         return self._members.keys()
 
     def get_member(self, member_name):
-        with libarchive.file_reader(self.source.path) as archive:
-            for entry in archive:
-                if entry.pathname == member_name:
-                    return self.get_subclass(entry)
-        raise KeyError('%s not found in archive', member_name)
+        self.ensure_scanned()
+        try:
+            entry = self._index[member_name]
+        except KeyError:
+            raise KeyError('%s not found in archive', member_name)
+        return self.get_subclass(entry)
 
     def get_filtered_members(self):
-        with libarchive.file_reader(self.source.path) as archive:
-            for entry in archive:
-                if any_excluded(entry.pathname):
-                    continue
-                yield entry.pathname, self.get_subclass(entry)
+        self.ensure_scanned()
+        for entry in self._entries:
+            if any_excluded(entry.pathname):
+                continue
+            yield entry.pathname, self.get_subclass(entry)
+
+    def get_member_size(self, member):
+        self.ensure_scanned()
+        return self._entries[self._positions[member.name]].size
+
+    def get_listing(self):
+        self.ensure_scanned()
+        return self._listing
+
+    def get_read_digest(self, member_name):
+        """
+        Return the digest of the member if we read it already, or None.
+        """
+
+        if not hasattr(self, '_digests'):
+            return None
+        return self._digests.get(member_name)
 
     def extract(self, member_name, dest_dir):
         self.ensure_unpacked()
+        if member_name not in self._extracted:
+            # Skipped as the same as the other side, but needed after all;
+            # get everything so that this happens at most once.
+            self.write_members(set(self._members) - self._extracted)
         return self._members[member_name]
 
     def get_subclass(self, entry):
@@ -200,17 +297,32 @@ class LibarchiveContainer(Archive):
 
         return LibarchiveMember(self, entry)
 
-    def ensure_unpacked(self):
+    def ensure_scanned(self):
+        """
+        Go through the archive, keeping its entries and their listing as
+        list_libarchive() gives it, choosing where to extract the members and
+        computing the digests of the regular ones. Their data has to be
+        decompressed to get to the next header anyway.
+        """
+
         if hasattr(self, '_members'):
             return
 
         tmpdir = get_temporary_directory().name
-        self._members = collections.OrderedDict()
-
-        logger.debug("Extracting %s to %s", self.source.path, tmpdir)
+        entries = []
+        index = {}
+        listing = []
+        positions = {}
+        digests = {}
+        members = collections.OrderedDict()
 
         with libarchive.file_reader(self.source.path) as archive:
             for idx, entry in enumerate(archive):
+                snapshot = snapshot_entry(entry)
+                entries.append(snapshot)
+                index.setdefault(snapshot.pathname, snapshot)
+                listing.append(format_entry(entry))
+
                 # Always skip directories
                 if entry.isdir:
                     continue
@@ -226,25 +338,108 @@ class LibarchiveContainer(Archive):
                 dst += ext
                 # Maintain a mapping of archive path to the extracted path,
                 # avoiding the need to sanitise filenames.
-                self._members[entry.pathname] = dst
+                members[entry.pathname] = dst
+                positions[entry.pathname] = idx
 
-                logger.debug("Extracting %s to %s", entry.pathname, dst)
-
-                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                # Later entries of the same name replace earlier ones
+                digests.pop(entry.pathname, None)
+                if entry.issym or entry.isblk or entry.ischr:
+                    continue
+                h = new_digest()
                 try:
-                    with open(dst, 'wb') as f:
-                        for block in entry.get_blocks():
-                            f.write(block)
+                    for block in entry.get_blocks():
+                        h.update(block)
                 except Exception as exc:
                     raise ContainerExtractionError(entry.pathname, exc)
+                digests[entry.pathname] = h.hexdigest()
+
+        self._entries = entries
+        self._index = index
+        self._listing = listing
+        self._positions = positions
+        self._digests = digests
+        self._members = members
+        self._extracted = set()
+        self._skipped = set()
+
+    def skip_same_members(self, other):
+        """
+        Don't extract the members with the same contents as those of the same
+        name in `other`, so that they are never written to disk.
+        """
+
+        self.ensure_scanned()
+        other.ensure_scanned()
+
+        same = {
+            x for x in self._members.keys() & other._members.keys()
+            if self._digests.get(x) is not None and
+            self._digests[x] == other._digests.get(x)
+        }
+        for x in (self, other):
+            x._skipped = same - x._extracted
+
+    def ensure_unpacked(self):
+        self.ensure_scanned()
+
+        if getattr(self, '_unpacked', False):
+            return
+
+        self._unpacked = True
+        self.write_members(
+            set(self._members) - self._skipped - self._extracted,
+        )
+
+    def write_members(self, names):
+        """
+        Go through the archive again, extracting the members in `names`.
+        """
+
+        if not names:
+            return
 
         logger.debug(
-            "Extracted %d entries from %s to %s",
-            len(self._members), self.source.path, tmpdir,
+            "Extracting %d members of %s", len(names), self.source.path,
         )
 
+        remaining = len(names)
+
+        with libarchive.file_reader(self.source.path) as archive:
+            for idx, entry in enumerate(archive):
+                # Don't decompress the rest of the archive for nothing
+                if not remaining:
+                    break
+                name = entry.pathname
+                if name not in names:
+                    continue
+                # Later entries of the same name replace earlier ones
+                if self._positions[name] != idx:
+                    continue
+                remaining -= 1
+                dst = self._members[name]
+                logger.debug("Extracting %s to %s", name, dst)
+                try:
+                    os.makedirs(os.path.dirname(dst), exist_ok=True)
+                    with DigestingWriter(dst) as f:
+                        for block in entry.get_blocks():
+                            f.write(block)
+                except Exception as exc:
+                    raise ContainerExtractionError(name, exc)
+                self._extracted.add(name)
+
     def comparisons(self, other):
         def hide_trivial_dirs(item):
             file1, file2, comment = item
             return not (isinstance(file1, Directory) and isinstance(file2, Directory) and comment is None)
+
+        if isinstance(other, LibarchiveContainer):
+            if not Config().force_details:
+                self.skip_same_members(other)
+            other.ensure_unpacked()
+
+        # Before the members are compared in worker processes, which would
+        # each go through the archive again to extract them and then forget
+        # about it.
+        self.ensure_unpacked()
+
         return filter(hide_trivial_dirs, super().comparisons(other))
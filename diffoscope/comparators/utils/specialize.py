@@ -25,31 +25,52 @@ from .. import ComparatorManager
 
 logger = logging.getLogger(__name__)
 
+# The classes files become when recognized, by comparator and their class
+_specialized_classes = {}
+
 
 def try_recognize(file, cls, recognizes):
     if isinstance(file, cls):
         return True
 
     # Does this file class match?
-    with profile('recognizes', file):
-        #logger.debug("trying %s on %s", cls, file)
-        if not recognizes(file):
+    if cls.EXPENSIVE_RECOGNIZES:
+        # Only ever probe a file once, even if it is specialized again
+        try:
+            recognized = file._recognized
+        except AttributeError:
+            recognized = file._recognized = {}
+        key = (cls, recognizes.__name__)
+        if key not in recognized:
+            with profile('recognizes', file):
+                recognized[key] = recognizes(file)
+        if not recognized[key]:
             return False
+    else:
+        with profile('recognizes', file):
+            #logger.debug("trying %s on %s", cls, file)
+            if not recognizes(file):
+                return False
 
     # Found a match; perform type magic
     logger.debug("Using %s for %s", cls.__name__, file.name)
-    new_cls = type(cls.__name__, (cls, type(file)), {})
+    key = (cls, type(file))
+    try:
+        new_cls = _specialized_classes[key]
+    except KeyError:
+        new_cls = _specialized_classes[key] = \
+            type(cls.__name__, (cls, type(file)), {})
     file.__class__ = new_cls
 
     return True
 
 
 def specialize(file):
-    for cls in ComparatorManager().classes:
+    for cls in ComparatorManager().candidates(file):
         if try_recognize(file, cls, cls.recognizes):
             return file
 
-    for cls in ComparatorManager().classes:
+    for cls in ComparatorManager().candidates(file):
         if try_recognize(file, cls, cls.fallback_recognizes):
             logger.debug("File recognized by fallback. Magic says: %s", file.magic_file_type)
             return file
@@ -63,7 +84,7 @@ def is_direct_instance(file, cls):
     # is_direct_instance(<IpkFile>, GzipFile) == False
     if not isinstance(file, cls):
         return False
-    for c in ComparatorManager().classes:
+    for c in ComparatorManager().imported():
         if c is not cls and isinstance(file, c):
             return False
     return True
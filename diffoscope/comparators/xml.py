@@ -72,6 +72,7 @@ class XMLFile(File):
         FILE_EXTENSION_SUFFIX (str): xml file extension suffix
     """
     FILE_EXTENSION_SUFFIX = '.xml'
+    EXPENSIVE_RECOGNIZES = True
 
     @classmethod
     def recognizes(cls, file):
@@ -18,11 +18,13 @@
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
 import re
+import lzma
+import shutil
 import os.path
 import logging
-import subprocess
 
-from diffoscope.tools import tool_required
+from diffoscope.exc import ContainerExtractionError
+from diffoscope.cache import DigestingWriter
 
 from .utils.file import File
 from .utils.archive import Archive
@@ -40,14 +42,15 @@ class XzContainer(Archive):
     def get_member_names(self):
         return [self.get_compressed_content_name('.xz')]
 
-    @tool_required('xz')
     def extract(self, member_name, dest_dir):
         dest_path = os.path.join(dest_dir, member_name)
         logger.debug('xz extracting to %s', dest_path)
-        with open(dest_path, 'wb') as fp:
-            subprocess.check_call(
-                ["xz", "--decompress", "--stdout", self.source.path],
-                shell=False, stdout=fp, stderr=None)
+        try:
+            with lzma.open(self.source.path, 'rb') as source, \
+                    DigestingWriter(dest_path) as target:
+                shutil.copyfileobj(source, target)
+        except (OSError, EOFError, lzma.LZMAError) as exc:
+            raise ContainerExtractionError(member_name, exc)
         return dest_path
 
 
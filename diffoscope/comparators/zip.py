@@ -20,9 +20,11 @@
 import re
 import sys
 import shutil
+import struct
 import os.path
 import zipfile
 
+from diffoscope.cache import DigestingWriter
 from diffoscope.tools import tool_required
 from diffoscope.difference import Difference
 
@@ -62,6 +64,40 @@ class BsdtarVerbose(Command):
         return ['bsdtar', '-tvf', self.path]
 
 
+def zip_metadata(path):
+    """
+    Return what zipinfo(1) and bsdtar(1) describe of a zip archive as it is
+    in the file: its size, the central directory and end of central
+    directory records (with the comment) and the local header of every
+    member.
+    """
+
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        with zipfile.ZipFile(f) as archive:
+            f.seek(archive.start_dir)
+            central_directory = f.read()
+            local_headers = []
+            for zipinfo in archive.infolist():
+                f.seek(zipinfo.header_offset)
+                header = f.read(zipfile.sizeFileHeader)
+                if len(header) != zipfile.sizeFileHeader:
+                    raise zipfile.BadZipFile("Truncated local header")
+                # Followed by the name and extra field
+                name_length, extra_length = struct.unpack('<HH', header[-4:])
+                local_headers.append(header + f.read(name_length + extra_length))
+
+    return size, central_directory, local_headers
+
+
+def has_same_zip_metadata(path1, path2):
+    try:
+        return zip_metadata(path1) == zip_metadata(path2)
+    except (OSError, ValueError, zipfile.BadZipFile):
+        # Leave it to the tools
+        return False
+
+
 class ZipDirectory(Directory, ArchiveMember):
     def __init__(self, archive, member_name):
         ArchiveMember.__init__(self, archive, member_name)
@@ -97,7 +133,7 @@ class ZipContainer(Archive):
         # can't be encoded using the filesystem encoding. So let's replace
         # any weird character so we can get to the bytes.
         targetpath = os.path.join(dest_dir, os.path.basename(member_name)).encode(sys.getfilesystemencoding(), errors='replace')
-        with self.archive.open(member_name) as source, open(targetpath, 'wb') as target:
+        with self.archive.open(member_name) as source, DigestingWriter(targetpath) as target:
             shutil.copyfileobj(source, target)
         return targetpath.decode(sys.getfilesystemencoding())
 
@@ -108,12 +144,20 @@ class ZipContainer(Archive):
         else:
             return ArchiveMember(self, member_name)
 
+    def get_member_size(self, member):
+        return self.archive.getinfo(member.name).file_size
+
 
 class ZipFile(File):
     CONTAINER_CLASS = ZipContainer
     FILE_TYPE_RE = re.compile(r'^(Zip archive|Java archive|EPUB document|OpenDocument (Text|Spreadsheet|Presentation|Drawing|Formula|Template|Text Template))\b')
 
     def compare_details(self, other, source=None):
+        # Don't run up to three tools on each side for them to tell us that
+        # the archives are described the same.
+        if has_same_zip_metadata(self.path, other.path):
+            return []
+
         zipinfo_difference = Difference.from_command(Zipinfo, self.path, other.path) or \
                              Difference.from_command(ZipinfoVerbose, self.path, other.path) or \
                              Difference.from_command(BsdtarVerbose, self.path, other.path)
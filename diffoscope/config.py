@@ -54,6 +54,9 @@ class Config(object):
     compute_visual_diffs = False
     max_container_depth = 50
     force_details = False
+    jobs = 1
+    cache_dir = None
+    max_cache_size = 2 ** 30  # 1 GiB
 
     _singleton = {}
 
@@ -20,21 +20,24 @@
 import re
 import io
 import os
-import errno
-import fcntl
+import abc
 import hashlib
 import logging
-import threading
+import functools
+import tempfile
+import selectors
 import subprocess
 
-from multiprocessing.dummy import Queue
-
-from diffoscope.tempfiles import get_temporary_directory
-
 from .tools import get_tool_name, tool_required
+from . import diffseq
 from .config import Config
+from .scheduler import Scheduler
 
 DIFF_CHUNK = 4096
+FEEDER_BUFFER_SIZE = 65536
+
+# How much output is held in memory by Spool before using a temporary file
+SPOOL_MEMORY_SIZE = 4 * 1024 * 1024
 
 logger = logging.getLogger(__name__)
 re_diff_change = re.compile(r'^([+-@]).*', re.MULTILINE)
@@ -45,17 +48,16 @@ class DiffParser(object):
         r'^@@\s+-(?P<start1>\d+)(,(?P<len1>\d+))?\s+\+(?P<start2>\d+)(,(?P<len2>\d+))?\s+@@$',
     )
 
-    def __init__(self, output, end_nl_q1, end_nl_q2):
-        self._output = output
-        self._end_nl_q1 = end_nl_q1
-        self._end_nl_q2 = end_nl_q2
+    def __init__(self, end_nl1, end_nl2):
+        # Works around a unified diff limitation: if both inputs don't end
+        # with a newline, don't make it a difference
+        self._end_nl = end_nl1 and end_nl2
         self._action = self.read_headers
         self._diff = io.StringIO()
         self._success = False
         self._remaining_hunk_lines = None
         self._block_len = None
         self._direction = None
-        self._end_nl = None
         self._max_lines = Config().max_diff_block_lines_saved
 
     @property
@@ -66,13 +68,12 @@ class DiffParser(object):
     def success(self):
         return self._success
 
-    def parse(self):
-        for line in self._output:
-            self._action = self._action(line.decode('utf-8', errors='replace'))
+    def feed(self, line):
+        self._action = self._action(line.decode('utf-8', errors='replace'))
 
+    def close(self):
         self._action('')
         self._success = True
-        self._output.close()
 
     def read_headers(self, line):
         if not line:
@@ -114,11 +115,6 @@ class DiffParser(object):
         elif line[0] == '-':
             self._remaining_hunk_lines -= 1
         elif line[0] == '\\':
-            # When both files don't end with \n, do not show it as a difference
-            if self._end_nl is None:
-                end_nl1 = self._end_nl_q1.get()
-                end_nl2 = self._end_nl_q2.get()
-                self._end_nl = end_nl1 and end_nl2
             if not self._end_nl:
                 return self.read_hunk
         elif self._remaining_hunk_lines == 0:
@@ -159,21 +155,398 @@ class DiffParser(object):
         return self.skip_block
 
 
+class FeederReader(object):
+    """
+    Reads the output of a feeder without blocking.
+
+    Feeders are generators yielding chunks of bytes and returning whether the
+    input ends with a newline. When they cannot make progress without more
+    input of their own (eg. the output of a Command) they yield an object
+    with filenos() and on_readable(fd) methods instead.
+    """
+
+    def __init__(self, feeder):
+        self.feeder = feeder()
+        self.chunks = []
+        self.size = 0
+        self.waiting = None
+        self.done = False
+        self.end_nl = False
+
+    def fill(self, size):
+        """
+        Buffer up to about `size` bytes, or less if we have to wait first.
+        """
+
+        while self.size < size and self.waiting is None and not self.done:
+            try:
+                chunk = next(self.feeder)
+            except StopIteration as exc:
+                self.done = True
+                self.end_nl = bool(exc.value)
+                break
+
+            if isinstance(chunk, bytes):
+                self.chunks.append(chunk)
+                self.size += len(chunk)
+            else:
+                self.waiting = chunk
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        self.size = 0
+        return data
+
+    def lines(self):
+        return sum(x.count(b'\n') for x in self.chunks)
+
+    def readable(self, waiting, fd):
+        waiting.on_readable(fd)
+        self.waiting = None
+
+    def events(self):
+        if self.waiting is None:
+            return {}
+        callback = functools.partial(self.readable, self.waiting)
+        return {
+            x: (selectors.EVENT_READ, callback)
+            for x in self.waiting.filenos()
+        }
+
+    def close(self):
+        self.feeder.close()
+
+
+class Prefetch(object):
+    """
+    Reads ahead from a feeder until it is done or has given us `size` bytes.
+    """
+
+    def __init__(self, reader, size):
+        self.reader = reader
+        self.size = size
+
+    def events(self):
+        self.reader.fill(self.size)
+        if self.reader.done or self.reader.size >= self.size:
+            return {}
+        return self.reader.events()
+
+
+class Spool(object):
+    """
+    Reads all the output of a feeder, hashing it on the way. It is kept in
+    memory, or in a temporary file if large, so that it can be fed again.
+    """
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.file = tempfile.SpooledTemporaryFile(
+            max_size=SPOOL_MEMORY_SIZE,
+            suffix='_diffoscope',
+        )
+        self.hash = hashlib.sha256()
+        self.length = 0
+
+    def events(self):
+        while True:
+            self.reader.fill(FEEDER_BUFFER_SIZE)
+            data = self.reader.take()
+            if not data:
+                break
+            self.hash.update(data)
+            self.length += len(data)
+            self.file.write(data)
+
+        if self.reader.done:
+            return {}
+        return self.reader.events()
+
+    def same_as(self, other):
+        return self.length == other.length and \
+            self.hash.digest() == other.hash.digest()
+
+    def feeder(self):
+        def feeder():
+            self.file.seek(0)
+            while True:
+                chunk = self.file.read(FEEDER_BUFFER_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+            return self.reader.end_nl
+        return feeder
+
+    def close(self):
+        self.reader.close()
+        self.file.close()
+
+
+class FeederPipe(object):
+    """
+    Feeds one of the inputs of diff(1) through a pipe without blocking.
+    """
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self.write_fd, False)
+        self.buf = memoryview(b'')
+
+    def write(self, fd):
+        try:
+            written = os.write(fd, self.buf)
+        except BlockingIOError:
+            return
+        except BrokenPipeError:
+            # diff(1) went away; its exit status will tell us why
+            self.reader.done = True
+            written = len(self.buf)
+        self.buf = self.buf[written:]
+
+    def close_read(self):
+        os.close(self.read_fd)
+        self.read_fd = None
+
+    def close(self):
+        for fd in (self.read_fd, self.write_fd):
+            if fd is not None:
+                os.close(fd)
+        self.read_fd = self.write_fd = None
+
+    def events(self):
+        """
+        Return what we need to wait for to make progress, filling our buffer
+        or closing the pipe first if possible.
+        """
+
+        if not self.buf:
+            self.reader.fill(FEEDER_BUFFER_SIZE)
+            self.buf = memoryview(self.reader.take())
+
+        if not self.buf and self.reader.done and self.write_fd is not None:
+            os.close(self.write_fd)
+            self.write_fd = None
+
+        if self.buf:
+            return {self.write_fd: (selectors.EVENT_WRITE, self.write)}
+
+        return self.reader.events()
+
+
+class DiffOutput(object):
+    """
+    Collects the output of diff(1) line by line, holding it back until we
+    know whether both inputs end with a newline.
+    """
+
+    def __init__(self, fd, readers):
+        self.fd = fd
+        self.readers = readers
+        self.parser = None
+        self.partial = b''
+        self.pending = []
+        self.eof = False
+
+    def read(self, fd):
+        try:
+            data = os.read(fd, FEEDER_BUFFER_SIZE)
+        except BlockingIOError:
+            return
+
+        if not data:
+            self.eof = True
+            if self.partial:
+                self.pending.append(self.partial)
+            self.flush()
+            return
+
+        lines = (self.partial + data).split(b'\n')
+        self.partial = lines.pop()
+        self.pending.extend(x + b'\n' for x in lines)
+        self.flush()
+
+    def flush(self):
+        if self.parser is None:
+            if not self.eof and not all(x.done for x in self.readers):
+                return
+            self.parser = DiffParser(*[x.end_nl for x in self.readers])
+
+        for line in self.pending:
+            self.parser.feed(line)
+        self.pending = []
+
+        if self.eof:
+            self.parser.close()
+
+    def events(self):
+        if self.eof:
+            return {}
+        return {self.fd: (selectors.EVENT_READ, self.read)}
+
+
+def run_loop(parts):
+    """
+    Wait for and dispatch the events each of `parts` asks for until none of
+    them need anything more.
+    """
+
+    with selectors.DefaultSelector() as selector:
+        registered = {}
+
+        while True:
+            wanted = {}
+            for x in parts:
+                wanted.update(x.events())
+
+            if not wanted:
+                return
+
+            for fd in set(registered) - set(wanted):
+                selector.unregister(fd)
+            for fd, (events, callback) in wanted.items():
+                if fd not in registered:
+                    selector.register(fd, events, callback)
+                elif registered[fd] != (events, callback):
+                    selector.modify(fd, events, callback)
+            registered = wanted
+
+            for key, _ in selector.select():
+                key.data(key.fd)
+
+
+class DiffBackend(object, metaclass=abc.ABCMeta):
+    """
+    A way of comparing the output of two feeders, producing a unified diff
+    with 7 lines of context, as cleaned up by DiffParser.
+    """
+
+    # The largest input, on either side, the backend should be used for.
+    max_size = float('inf')
+    max_lines = float('inf')
+
+    def accepts(self, readers):
+        """
+        Whether we should compare `readers`, from which up to a little more
+        than the largest `max_size` of all backends has been read already.
+        """
+
+        if self.max_size == float('inf') and self.max_lines == float('inf'):
+            return True
+
+        return all(
+            x.done and x.size <= self.max_size and x.lines() <= self.max_lines
+            for x in readers
+        )
+
+    @abc.abstractmethod
+    def diff(self, reader1, reader2):
+        """
+        Return the differences between the output of the two FeederReader
+        instances, or None if there are none.
+        """
+
+        raise NotImplementedError()
+
+
+class ExternalDiff(DiffBackend):
+    """
+    Runs diff(1). Suitable for inputs of any size, as they are streamed.
+    """
+
+    def diff(self, reader1, reader2):
+        return run_diff(reader1, reader2)
+
+
+class InProcessDiff(DiffBackend):
+    """
+    Compares small inputs without the cost of starting diff(1), producing the
+    same output.
+    """
+
+    # The time taken grows with the product of the number of lines and of
+    # differences. Below this, it is always quicker than diff(1).
+    max_size = 65536
+    max_lines = 100
+
+    def diff(self, reader1, reader2):
+        return parse_unified_diff(
+            diffseq.unified_diff(reader1.take(), reader2.take()),
+            reader1.end_nl,
+            reader2.end_nl,
+        )
+
+
+def parse_unified_diff(lines, end_nl1=True, end_nl2=True):
+    """
+    Pass lines of a unified diff produced in-process through DiffParser, as if
+    they came from diff(1). Returns None if there are none.
+    """
+
+    parser = DiffParser(end_nl1, end_nl2)
+
+    found = False
+    for line in lines:
+        parser.feed(line)
+        found = True
+    parser.close()
+
+    if not found:
+        return None
+
+    return parser.diff
+
+
+# In order of preference; the first one accepting the inputs is used.
+DIFF_BACKENDS = [
+    InProcessDiff(),
+    ExternalDiff(),
+]
+
+
 @tool_required('diff')
-def run_diff(fifo1, fifo2, end_nl_q1, end_nl_q2):
-    cmd = [get_tool_name('diff'), '-aU7', fifo1, fifo2]
+def run_diff(reader1, reader2):
+    """
+    Run diff(1) on the output of two feeders. Everything happens in the
+    calling thread: the feeders, any commands they read from and diff(1)
+    itself are multiplexed over pipes.
+    """
+
+    readers = [reader1, reader2]
+    pipes = [FeederPipe(x) for x in readers]
+    cmd = [get_tool_name('diff'), '-aU7'] + [
+        '/dev/fd/{}'.format(x.read_fd) for x in pipes
+    ]
 
     logger.debug("Running %s", ' '.join(cmd))
 
-    p = subprocess.Popen(
-        cmd,
-        bufsize=1,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-    )
-    parser = DiffParser(p.stdout, end_nl_q1, end_nl_q2)
-    parser.parse()
-    p.wait()
+    try:
+        with Scheduler().slot():
+            p = subprocess.Popen(
+                cmd,
+                pass_fds=[x.read_fd for x in pipes],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+            )
+            for x in pipes:
+                x.close_read()
+
+            with p.stdout:
+                os.set_blocking(p.stdout.fileno(), False)
+                output = DiffOutput(p.stdout.fileno(), readers)
+                try:
+                    run_loop(pipes + [output])
+                except BaseException:
+                    p.kill()
+                    raise
+                finally:
+                    p.wait()
+    finally:
+        for x in pipes:
+            x.close()
+
+    parser = output.parser
 
     logger.debug(
         "%s: returncode %d, parsed %s",
@@ -191,65 +564,51 @@ def run_diff(fifo1, fifo2, end_nl_q1, end_nl_q2):
     return parser.diff
 
 
-class FIFOFeeder(threading.Thread):
-    def __init__(self, feeder, fifo_path, end_nl_q=None, daemon=True, *args):
-        os.mkfifo(fifo_path)
-        super().__init__(daemon=daemon)
-        self.feeder = feeder
-        self.fifo_path = fifo_path
-        self.end_nl_q = Queue() if end_nl_q is None else end_nl_q
-        self._exception = None
-        self._want_join = threading.Event()
+def diff(feeder1, feeder2, hash_first=False):
+    """
+    Return the differences between the output of two feeders, or None if there
+    are none. With `hash_first`, both outputs are read in full beforehand and
+    compared by digest, so that identical ones are never diffed.
+    """
 
-    def __enter__(self):
-        self.start()
-        return self
+    if hash_first:
+        return diff_spooled(feeder1, feeder2)
 
-    def __exit__(self, exc_type, exc_value, exc_tb):
-        self.join()
+    readers = [FeederReader(feeder1), FeederReader(feeder2)]
 
-    def run(self):
-        try:
-            # Try to open the FIFO nonblocking, so we can periodically check
-            # if the main thread wants us to wind down.  If it does, there's no
-            # more need for the FIFO, so stop the thread.
-            while True:
-                try:
-                    fd = os.open(self.fifo_path, os.O_WRONLY | os.O_NONBLOCK)
-                except OSError as error:
-                    if error.errno != errno.ENXIO:
-                        raise
-                    elif self._want_join.is_set():
-                        return
-                else:
-                    break
+    # Read enough to tell which backends are suitable
+    prefetch = max(
+        x.max_size for x in DIFF_BACKENDS if x.max_size != float('inf')
+    ) + 1
 
-            # Now clear the fd's nonblocking flag to let writes block normally.
-            fcntl.fcntl(fd, fcntl.F_SETFL, 0)
+    try:
+        run_loop([Prefetch(x, prefetch) for x in readers])
 
-            with open(fd, 'wb') as fifo:
-                # The queue works around a unified diff limitation: if there's
-                # no newlines in both don't make it a difference
-                end_nl = self.feeder(fifo)
-                self.end_nl_q.put(end_nl)
-        except Exception as error:
-            self._exception = error
+        for backend in DIFF_BACKENDS:
+            if backend.accepts(readers):
+                return backend.diff(*readers)
+    finally:
+        for x in readers:
+            x.close()
 
-    def join(self):
-        self._want_join.set()
-        super().join()
-        if self._exception is not None:
-            raise self._exception
 
+def diff_spooled(feeder1, feeder2):
+    spools = [Spool(FeederReader(feeder1)), Spool(FeederReader(feeder2))]
 
-def diff(feeder1, feeder2):
-    tmpdir = get_temporary_directory().name
+    try:
+        run_loop(spools)
+
+        if spools[0].same_as(spools[1]):
+            logger.debug(
+                "Skipping diff of identical outputs (%d bytes)",
+                spools[0].length,
+            )
+            return None
 
-    fifo1_path = os.path.join(tmpdir, 'fifo1')
-    fifo2_path = os.path.join(tmpdir, 'fifo2')
-    with FIFOFeeder(feeder1, fifo1_path) as fifo1, \
-            FIFOFeeder(feeder2, fifo2_path) as fifo2:
-        return run_diff(fifo1_path, fifo2_path, fifo1.end_nl_q, fifo2.end_nl_q)
+        return diff(*[x.feeder() for x in spools])
+    finally:
+        for x in spools:
+            x.close()
 
 
 def diff_split_lines(diff, keepends=True):
@@ -301,7 +660,10 @@ def color_unified_diff(diff):
 
 DIFFON = "\x01"
 DIFFOFF = "\x02"
-MAX_WF_SIZE = 1024  # any higher, and linediff takes >1 second and >200MB RAM
+# The search for the shortest edit script between two lines falls back to a
+# quicker approximation after a number of steps, chosen so that the time taken
+# (roughly their length multiplied by the steps) stays within this.
+LINEDIFF_MAX_WORK = 1 << 20
 
 
 def _linediff_sane(x):
@@ -309,16 +671,8 @@ def _linediff_sane(x):
     return "." if ord(x) < 32 and x not in '\t\n' else x
 
 
-def diffinput_truncate(s, sz):
-    # Truncate, preserving uniqueness
-    if len(s) > sz:
-        s = s[:sz] + "[ ... truncated by diffoscope; len: {}, SHA1: {} ... ]".format(
-            len(s[sz:]), hashlib.sha1(s[sz:].encode('utf-8')).hexdigest())
-    return s
-
-
 def linediff(s, t, diffon, diffoff):
-    # calculate common prefix/suffix, easy optimisation to WF
+    # calculate common prefix/suffix, easy optimisation to the line diff
     prefix = os.path.commonprefix((s, t))
     if prefix:
         s = s[len(prefix):]
@@ -328,10 +682,10 @@ def linediff(s, t, diffon, diffoff):
         s = s[:-len(suffix)]
         t = t[:-len(suffix)]
 
-    # truncate so WF doesn't blow up RAM
-    s = diffinput_truncate(s, MAX_WF_SIZE)
-    t = diffinput_truncate(t, MAX_WF_SIZE)
-    l1, l2 = zip(*linediff_simplify(linediff_wagnerfischer(s, t)))
+    if not s and not t:
+        return prefix + suffix, prefix + suffix
+
+    l1, l2 = zip(*linediff_simplify(linediff_myers(s, t)))
 
     def to_string(k, v):
         sanev = "".join(_linediff_sane(c) for c in v)
@@ -341,64 +695,44 @@ def linediff(s, t, diffon, diffoff):
     return prefix + s1 + suffix, prefix + t1 + suffix
 
 
-def linediff_wagnerfischer(s, t):
-    '''
-    Line diff algorithm, originally from diff2html.
+def linediff_myers(s, t):
+    """
+    Line diff algorithm, pairing up the characters of the two strings.
 
-    https://en.wikipedia.org/wiki/Wagner%E2%80%93Fischer_algorithm
+    Finds the longest common subsequence with Myers' O(ND) algorithm, which
+    only needs memory linear in the length of the strings. Characters removed
+    and added at the same place are shown as replaced.
+    """
 
-    Finds the minimum (levenshtein) edit distance between two strings, but has
-    quadratic performance O(m*n).
-    '''
     m, n = len(s), len(t)
-    d = [[(0, 0) for i in range(n+1)] for i in range(m+1)]
-
-    d[0][0] = (0, (0, 0))
-    for i in range(1, m+1):
-        d[i][0] = (i, (i-1, 0))
-    for j in range(1, n+1):
-        d[0][j] = (j, (0, j-1))
-
-    for i in range(1, m+1):
-        for j in range(1, n+1):
-            if s[i-1] == t[j-1]:
-                cost = 0
+    too_expensive = max(8, min(256, LINEDIFF_MAX_WORK // (m + n)))
+    changed1, changed2 = diffseq.changes(s, t, too_expensive)
+    i = j = 0
+
+    while i < m or j < n:
+        if i < m and j < n and not changed1[i] and not changed2[j]:
+            yield (False, s[i]), (False, t[j])
+            i += 1
+            j += 1
+            continue
+
+        i0, j0 = i, j
+        while i < m and changed1[i]:
+            i += 1
+        while j < n and changed2[j]:
+            j += 1
+
+        for x in range(max(i - i0, j - j0)):
+            if x < i - i0 and x < j - j0:
+                yield (True, s[i0 + x]), (True, t[j0 + x])
+            elif x < i - i0:
+                yield (True, s[i0 + x]), (False, "")
             else:
-                cost = 1
-            d[i][j] = min((d[i-1][j][0] + 1, (i-1, j)),
-                          (d[i][j-1][0] + 1, (i, j-1)),
-                          (d[i-1][j-1][0] + cost, (i-1, j-1)))
-
-    l = []
-    coord = (m, n)
-    while coord != (0, 0):
-        l.insert(0, coord)
-        x, y = coord
-        coord = d[x][y][1]
-
-    for coord in l:
-        cx, cy = coord
-        child_val = d[cx][cy][0]
-
-        father_coord = d[cx][cy][1]
-        fx, fy = father_coord
-        father_val = d[fx][fy][0]
-
-        diff = (cx-fx, cy-fy)
-
-        if diff == (0, 1):
-            yield (False, ""), (True, t[fy])
-        elif diff == (1, 0):
-            yield (True, s[fx]), (False, "")
-        elif child_val-father_val == 1:
-            yield (True, s[fx]), (True, t[fy])
-        else:
-            assert s[fx] == t[fy]
-            yield (False, s[fx]), (False, t[fy])
+                yield (False, ""), (True, t[j0 + x])
 
 
 def linediff_simplify(g):
-    """Simplify the output of WF."""
+    """Simplify the output of linediff_myers."""
     current = None
     for l, r in g:
         if not current:
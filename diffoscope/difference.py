@@ -24,6 +24,7 @@ from . import feeders
 from .exc import RequiredToolNotFound
 from .diff import diff, reverse_unified_diff, diff_split_lines
 from .excludes import command_excluded
+from .scheduler import Scheduler
 
 logger = logging.getLogger(__name__)
 
@@ -94,6 +95,22 @@ class Difference(object):
             visuals=self._visuals[:],
         ))
 
+    def map_sources(self, f1, f2):
+        """
+        Copy this difference, applying f1 and f2 to the names of the sources
+        here and in the details.
+        """
+
+        return self.__class__(
+            self.unified_diff,
+            f1(self.source1),
+            f2(self.source2),
+            comment=self._comments[:],
+            has_internal_linenos=self.has_internal_linenos,
+            details=[d.map_sources(f1, f2) for d in self._details],
+            visuals=self._visuals[:],
+        )
+
     def _reverse_self(self):
         # assumes we're being called from get_reverse()
         if self._visuals:
@@ -177,9 +194,10 @@ class Difference(object):
                     heapq.heappush(queue, (scorer(d, val), d))
 
     @staticmethod
-    def from_feeder(feeder1, feeder2, path1, path2, source=None, comment=None, **kwargs):
+    def from_feeder(feeder1, feeder2, path1, path2, source=None, comment=None,
+                    hash_first=False, **kwargs):
         try:
-            unified_diff = diff(feeder1, feeder2)
+            unified_diff = diff(feeder1, feeder2, hash_first=hash_first)
             if not unified_diff:
                 return None
             return Difference(
@@ -230,6 +248,19 @@ class Difference(object):
 
     @staticmethod
     def from_command_exc(klass, path1, path2, *args, **kwargs):
+        # Both commands and diff(1) run as a pipeline so they need to share a
+        # single job slot.
+        with Scheduler().slot():
+            return Difference._from_command_exc(
+                klass,
+                path1,
+                path2,
+                *args,
+                **kwargs
+            )
+
+    @staticmethod
+    def _from_command_exc(klass, path1, path2, *args, **kwargs):
         command_args = []
         if 'command_args' in kwargs:
             command_args = kwargs['command_args']
@@ -244,7 +275,6 @@ class Difference(object):
                 feeder = feeders.from_command(command)
                 if command_excluded(command.shell_cmdline()):
                     return None, None, True
-                command.start()
             return feeder, command, False
 
         feeder1, command1, excluded1 = command_and_feeder(path1)
@@ -257,12 +287,15 @@ class Difference(object):
             source_cmd = command1 or command2
             kwargs['source'] = source_cmd.shell_cmdline()
 
+        # The output of tools run on similar files is often identical, so don't
+        # bother running diff(1) on it when their digests match.
         difference = Difference.from_feeder(
             feeder1,
             feeder2,
             path1,
             path2,
             *args,
+            hash_first=True,
             **kwargs
         )
         if not difference:
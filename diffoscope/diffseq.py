@@ -0,0 +1,660 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+# Copyright © 1988-2017 Free Software Foundation, Inc.
+#
+# Ported from GNU diffutils (src/analyze.c, src/io.c and lib/diffseq.h),
+# which is also distributed under the GNU General Public License, version 3
+# or later.
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+An in-process equivalent of `diff -aU<context>` for small inputs.
+
+Where there are several equally short edit scripts, diff(1) picks one by way
+of a number of heuristics. As diffoscope's output must not depend on which
+implementation produced it, this follows GNU diffutils (io.c, analyze.c and
+diffseq.h) step by step rather than being a textbook Myers diff:
+
+ - the identical prefix and suffix of the inputs are skipped, except for
+   `context` lines either side;
+ - lines without a match in the other input are "discarded" before the main
+   comparison;
+ - the middle snake is found as in diffseq.h; and finally
+ - runs of changes are shifted to merge with their neighbours.
+
+The search is never cut short (see "too_expensive" in diffseq.h), so callers
+must keep the inputs below MAX_LINES lines each.
+"""
+
+NO_NEWLINE = b'\\ No newline at end of file\n'
+
+# Below this, the cost of the search can never reach the point where diff(1)
+# would give up on finding the shortest edit script.
+MAX_LINES = 4000
+
+
+class _Input(object):
+    def __init__(self, content):
+        self.content = content
+        self.missing_newline = content[-1:] not in (b'', b'\n')
+
+        # diff(1) considers an incomplete last line to be different from the
+        # same line with a newline, so keep it as it is.
+        parts = content.split(b'\n')
+        self.lines = [x + b'\n' for x in parts[:-1]]
+        if parts[-1]:
+            self.lines.append(parts[-1])
+
+
+def _identical_ends(a, b, context):
+    """
+    Return the number of lines of the identical prefix and suffix diff(1)
+    would not look at, following find_identical_ends() in io.c.
+    """
+
+    # prepare_text() adds the missing newline to the buffer
+    buf0 = a.content + (b'\n' if a.missing_newline else b'')
+    buf1 = b.content + (b'\n' if b.missing_newline else b'')
+    n0, n1 = len(buf0), len(buf1)
+
+    # Find the identical prefix
+    p = 0
+    limit = min(n0, n1)
+    while p < limit and buf0[p] == buf1[p]:
+        p += 1
+
+    # Don't mistakenly count the missing newline as part of the prefix
+    if (n0 - a.missing_newline < p) != (n1 - b.missing_newline < p):
+        p -= 1
+
+    # Skip back to the last line beginning in the prefix, and then keep up
+    # to `context` lines of it
+    i = context
+    while p != 0:
+        if buf0[p - 1] == 10:
+            if i == 0:
+                break
+            i -= 1
+        p -= 1
+    prefix_end0 = prefix_end1 = p
+
+    # Find the identical suffix
+    p0, p1 = n0, n1
+    if a.missing_newline == b.missing_newline:
+        end0 = p0
+        beg0 = prefix_end0 + (0 if n0 < n1 else n0 - n1)
+
+        while p0 != beg0:
+            p0 -= 1
+            p1 -= 1
+            if buf0[p0] != buf1[p1]:
+                p0 += 1
+                p1 += 1
+                beg0 = p0
+                break
+
+        # Keep up to `context` lines of the suffix, plus the rest of the
+        # current line if we are not at the beginning of one.
+        i = context + (not (
+            (p0 == 0 or buf0[p0 - 1] == 10) and
+            (p1 == 0 or buf1[p1 - 1] == 10)
+        ))
+        while i and p0 != end0:
+            i -= 1
+            while True:
+                p0 += 1
+                if buf0[p0 - 1] == 10:
+                    break
+        p1 += p0 - beg0
+
+    prefix_lines = buf0.count(b'\n', 0, prefix_end0)
+    suffix_lines0 = buf0.count(b'\n', p0)
+    suffix_lines1 = buf1.count(b'\n', p1)
+
+    return prefix_lines, suffix_lines0, suffix_lines1
+
+
+def _discard_confusing_lines(equivs, changed):
+    """
+    Discard lines which have no match in the other input, as well as lines
+    with many matches when they are surrounded by discarded lines. Returns,
+    for each input, the equivalence classes and indices of the lines which
+    are left.
+    """
+
+    counts = [{}, {}]
+    for f in (0, 1):
+        for x in equivs[f]:
+            counts[f][x] = counts[f].get(x, 0) + 1
+
+    discarded = [[], []]
+    for f in (0, 1):
+        end = len(equivs[f])
+        other = counts[1 - f]
+
+        # Approximate square root of the number of lines
+        many = 5
+        tem = end // 64
+        while True:
+            tem >>= 2
+            if tem <= 0:
+                break
+            many *= 2
+
+        for x in equivs[f]:
+            nmatch = other.get(x, 0)
+            if nmatch == 0:
+                discarded[f].append(1)
+            elif nmatch > many:
+                discarded[f].append(2)
+            else:
+                discarded[f].append(0)
+
+    # Don't really discard the provisional lines except when they occur in a
+    # run of discardables, with nonprovisionals at the beginning and end.
+    for f in (0, 1):
+        discards = discarded[f]
+        end = len(discards)
+        i = 0
+        while i < end:
+            if discards[i] == 2:
+                discards[i] = 0
+            elif discards[i] != 0:
+                provisional = 0
+                j = i
+                while j < end:
+                    if discards[j] == 0:
+                        break
+                    if discards[j] == 2:
+                        provisional += 1
+                    j += 1
+
+                # Cancel provisional discards at the end, and shrink the run
+                while j > i and discards[j - 1] == 2:
+                    j -= 1
+                    discards[j] = 0
+                    provisional -= 1
+
+                length = j - i
+
+                if provisional * 4 > length:
+                    while j > i:
+                        j -= 1
+                        if discards[j] == 2:
+                            discards[j] = 0
+                else:
+                    minimum = 1
+                    tem = length >> 2
+                    while True:
+                        tem >>= 2
+                        if tem <= 0:
+                            break
+                        minimum <<= 1
+                    minimum += 1
+
+                    # Cancel any subrun of `minimum` or more provisionals
+                    # within the larger run.
+                    j = 0
+                    consec = 0
+                    while j < length:
+                        if discards[i + j] != 2:
+                            consec = 0
+                        else:
+                            consec += 1
+                            if minimum == consec:
+                                # Back up to the start of the subrun to
+                                # cancel it all.
+                                j -= consec
+                            elif minimum < consec:
+                                discards[i + j] = 0
+                        j += 1
+
+                    # Cancel provisionals from the beginning of the run until
+                    # we find 3 or more nonprovisionals in a row, or the first
+                    # nonprovisional at least 8 lines in.
+                    consec = 0
+                    for j in range(length):
+                        if j >= 8 and discards[i + j] == 1:
+                            break
+                        if discards[i + j] == 2:
+                            consec = 0
+                            discards[i + j] = 0
+                        elif discards[i + j] == 0:
+                            consec = 0
+                        else:
+                            consec += 1
+                        if consec == 3:
+                            break
+
+                    i += length - 1
+
+                    # Same thing, from the end
+                    consec = 0
+                    for j in range(length):
+                        if j >= 8 and discards[i - j] == 1:
+                            break
+                        if discards[i - j] == 2:
+                            consec = 0
+                            discards[i - j] = 0
+                        elif discards[i - j] == 0:
+                            consec = 0
+                        else:
+                            consec += 1
+                        if consec == 3:
+                            break
+            i += 1
+
+    undiscarded = [[], []]
+    realindexes = [[], []]
+    for f in (0, 1):
+        for i, x in enumerate(equivs[f]):
+            if discarded[f][i] == 0:
+                undiscarded[f].append(x)
+                realindexes[f].append(i)
+            else:
+                changed[f][i + 1] = 1
+
+    return undiscarded, realindexes
+
+
+def changes(xvec, yvec, too_expensive=None):
+    """
+    Return, for each of the sequences, a list of whether each item is not part
+    of their longest common subsequence.
+
+    If `too_expensive` is given, the search for the shortest edit script of
+    any part of the problem is cut short after that many steps, which bounds
+    the time taken at the price of a longer edit script.
+    """
+
+    changed = [[0] * (len(xvec) + 2), [0] * (len(yvec) + 2)]
+    _compareseq(
+        xvec,
+        yvec,
+        range(len(xvec)),
+        range(len(yvec)),
+        changed,
+        too_expensive,
+    )
+    return [bool(x) for x in changed[0][1:-1]], \
+        [bool(x) for x in changed[1][1:-1]]
+
+
+def _compareseq(xvec, yvec, xrealindexes, yrealindexes, changed,
+                too_expensive=None):
+    """
+    Mark the lines which are not part of the longest common subsequence of
+    `xvec` and `yvec`, dividing the problem at the "middle snake" of the
+    shortest edit script like compareseq() in diffseq.h.
+    """
+
+    fd = {}
+    bd = {}
+    stack = [(0, len(xvec), 0, len(yvec))]
+
+    while stack:
+        xoff, xlim, yoff, ylim = stack.pop()
+
+        # Slide down the bottom initial diagonal
+        while xoff < xlim and yoff < ylim and xvec[xoff] == yvec[yoff]:
+            xoff += 1
+            yoff += 1
+
+        # Slide up the top initial diagonal
+        while xoff < xlim and yoff < ylim and \
+                xvec[xlim - 1] == yvec[ylim - 1]:
+            xlim -= 1
+            ylim -= 1
+
+        if xoff == xlim:
+            for y in range(yoff, ylim):
+                changed[1][yrealindexes[y] + 1] = 1
+        elif yoff == ylim:
+            for x in range(xoff, xlim):
+                changed[0][xrealindexes[x] + 1] = 1
+        else:
+            xmid, ymid = _diag(
+                xvec, yvec, xoff, xlim, yoff, ylim, fd, bd, too_expensive,
+            )
+            # The first half is done first
+            stack.append((xmid, xlim, ymid, ylim))
+            stack.append((xoff, xmid, yoff, ymid))
+
+
+def _diag(xvec, yvec, xoff, xlim, yoff, ylim, fd, bd, too_expensive=None):
+    dmin = xoff - ylim
+    dmax = xlim - yoff
+    fmid = xoff - yoff
+    bmid = xlim - ylim
+    fmin = fmax = fmid
+    bmin = bmax = bmid
+    odd = (fmid - bmid) & 1
+
+    fd[fmid] = xoff
+    bd[bmid] = xlim
+    cost = 0
+
+    while True:
+        # Extend the top-down search by an edit step in each diagonal
+        if fmin > dmin:
+            fmin -= 1
+            fd[fmin - 1] = -1
+        else:
+            fmin += 1
+        if fmax < dmax:
+            fmax += 1
+            fd[fmax + 1] = -1
+        else:
+            fmax -= 1
+
+        for d in range(fmax, fmin - 1, -2):
+            tlo = fd[d - 1]
+            thi = fd[d + 1]
+            x = thi if tlo < thi else tlo + 1
+            y = x - d
+            while x < xlim and y < ylim and xvec[x] == yvec[y]:
+                x += 1
+                y += 1
+            fd[d] = x
+            if odd and bmin <= d <= bmax and bd[d] <= x:
+                return x, y
+
+        # Similarly extend the bottom-up search
+        if bmin > dmin:
+            bmin -= 1
+            bd[bmin - 1] = float('inf')
+        else:
+            bmin += 1
+        if bmax < dmax:
+            bmax += 1
+            bd[bmax + 1] = float('inf')
+        else:
+            bmax -= 1
+
+        for d in range(bmax, bmin - 1, -2):
+            tlo = bd[d - 1]
+            thi = bd[d + 1]
+            x = tlo if tlo < thi else thi - 1
+            y = x - d
+            while xoff < x and yoff < y and xvec[x - 1] == yvec[y - 1]:
+                x -= 1
+                y -= 1
+            bd[d] = x
+            if not odd and fmin <= d <= fmax and x <= fd[d]:
+                return x, y
+
+        cost += 1
+        if too_expensive is not None and cost >= too_expensive:
+            return _diag_best(
+                xoff, xlim, yoff, ylim, fd, bd, fmin, fmax, bmin, bmax,
+            )
+
+
+def _diag_best(xoff, xlim, yoff, ylim, fd, bd, fmin, fmax, bmin, bmax):
+    """
+    Give up on finding the middle snake and return the point furthest along
+    either search instead, as diag() in diffseq.h does when it becomes too
+    expensive.
+    """
+
+    fxybest = -1
+    for d in range(fmax, fmin - 1, -2):
+        x = min(fd[d], xlim)
+        y = x - d
+        if ylim < y:
+            x = ylim + d
+            y = ylim
+        if fxybest < x + y:
+            fxybest = x + y
+            fxbest = x
+
+    bxybest = float('inf')
+    for d in range(bmax, bmin - 1, -2):
+        x = max(xoff, bd[d])
+        y = x - d
+        if y < yoff:
+            x = yoff + d
+            y = yoff
+        if x + y < bxybest:
+            bxybest = x + y
+            bxbest = x
+
+    if (xlim + ylim) - bxybest < fxybest - (xoff + yoff):
+        return fxbest, fxybest - fxbest
+    return bxbest, bxybest - bxbest
+
+
+def _shift_boundaries(equivs, changed):
+    """
+    Move each run of changes as far back as possible (so long as that merges
+    it with a previous run) and otherwise forward, like shift_boundaries()
+    in analyze.c. The `changed` lists have a 0 sentinel at each end.
+    """
+
+    for f in (0, 1):
+        this = changed[f]
+        other = changed[1 - f]
+        eq = equivs[f]
+        i = j = 0
+        i_end = len(eq)
+
+        while True:
+            # Scan forwards to find the beginning of another run of changes,
+            # keeping track of the corresponding point in the other input.
+            while i < i_end and not this[i + 1]:
+                while other[j + 1]:
+                    j += 1
+                j += 1
+                i += 1
+
+            if i == i_end:
+                break
+
+            start = i
+
+            # Find the end of this run of changes
+            i += 1
+            while this[i + 1]:
+                i += 1
+            while other[j + 1]:
+                j += 1
+
+            while True:
+                runlength = i - start
+
+                # Move the changed region back, so long as the previous
+                # unchanged line matches the last changed one.
+                while start and eq[start - 1] == eq[i - 1]:
+                    start -= 1
+                    this[start + 1] = 1
+                    i -= 1
+                    this[i + 1] = 0
+                    while this[start]:
+                        start -= 1
+                    j -= 1
+                    while other[j + 1]:
+                        j -= 1
+
+                # The end of the changed run, at the last point where it
+                # corresponds to a changed run in the other input.
+                corresponding = i if other[j] else i_end
+
+                # Move the changed region forward, so long as the first
+                # changed line matches the following unchanged one.
+                while i != i_end and eq[start] == eq[i]:
+                    this[start + 1] = 0
+                    start += 1
+                    this[i + 1] = 1
+                    i += 1
+                    while this[i + 1]:
+                        i += 1
+                    j += 1
+                    while other[j + 1]:
+                        j += 1
+                        corresponding = i
+
+                if runlength == i - start:
+                    break
+
+            # If possible, move the fully-merged run of changes back to a
+            # corresponding run in the other input.
+            while corresponding < i:
+                start -= 1
+                this[start + 1] = 1
+                i -= 1
+                this[i + 1] = 0
+                j -= 1
+                while other[j + 1]:
+                    j -= 1
+
+
+def _changes(changed, len0, len1):
+    """
+    Return the (line0, line1, deleted, inserted) runs of changes, in order.
+    """
+
+    changes = []
+    i0, i1 = len0, len1
+    while i0 >= 0 or i1 >= 0:
+        if changed[0][i0] or changed[1][i1]:
+            line0, line1 = i0, i1
+            while changed[0][i0]:
+                i0 -= 1
+            while changed[1][i1]:
+                i1 -= 1
+            changes.append((i0, i1, line0 - i0, line1 - i1))
+        i0 -= 1
+        i1 -= 1
+    changes.reverse()
+    return changes
+
+
+def _range(a, b):
+    # When the range is empty, diff(1) prints the line number before it
+    if b < a:
+        return '{},0'.format(b + 1)
+    if a == b:
+        return '{}'.format(b + 1)
+    return '{},{}'.format(a + 1, b - a + 1)
+
+
+def _hunks(changes, context):
+    """
+    Group changes which are less than 2 * context + 1 lines apart, like
+    find_hunk() in context.c.
+    """
+
+    hunk = []
+    for change in changes:
+        if hunk:
+            line0, _, deleted, _ = hunk[-1]
+            if change[0] - (line0 + deleted) >= 2 * context + 1:
+                yield hunk
+                hunk = []
+        hunk.append(change)
+    if hunk:
+        yield hunk
+
+
+def unified_diff(content1, content2, context=7):
+    """
+    Yield the hunks of `diff -aU<context>` between the bytes `content1` and
+    `content2` (without the --- and +++ headers) line by line, or nothing if
+    they are the same.
+    """
+
+    a = _Input(content1)
+    b = _Input(content2)
+
+    if len(a.lines) > MAX_LINES or len(b.lines) > MAX_LINES:
+        raise ValueError("Too many lines to compare in-process")
+
+    if content1 == content2:
+        return
+
+    prefix, suffix0, suffix1 = _identical_ends(a, b, context)
+    lines = (
+        a.lines[prefix:len(a.lines) - suffix0],
+        b.lines[prefix:len(b.lines) - suffix1],
+    )
+
+    classes = {}
+    equivs = tuple(
+        [classes.setdefault(x, len(classes) + 1) for x in y]
+        for y in lines
+    )
+
+    # Whether each line is changed, with a sentinel at each end
+    changed = tuple([0] * (len(x) + 2) for x in lines)
+
+    (xvec, yvec), (xreal, yreal) = _discard_confusing_lines(equivs, changed)
+    _compareseq(xvec, yvec, xreal, yreal, changed)
+    _shift_boundaries(equivs, changed)
+
+    changes = [
+        (line0 + prefix, line1 + prefix, deleted, inserted)
+        for line0, line1, deleted, inserted in
+        _changes(changed, len(lines[0]), len(lines[1]))
+    ]
+
+    yield from unified_hunks(changes, a.lines, b.lines, context)
+
+
+def unified_hunks(changes, lines0, lines1, context):
+    """
+    Yield the hunks of a unified diff line by line, given the changes between
+    the sequences of lines `lines0` and `lines1` as (line0, line1, deleted,
+    inserted) tuples in order.
+    """
+
+    for hunk in _hunks(changes, context):
+        first0, first1, _, _ = hunk[0]
+        line0, line1, deleted, inserted = hunk[-1]
+        first0 = max(first0 - context, 0)
+        first1 = max(first1 - context, 0)
+        last0 = min(line0 + deleted - 1 + context, len(lines0) - 1)
+        last1 = min(line1 + inserted - 1 + context, len(lines1) - 1)
+
+        yield '@@ -{} +{} @@\n'.format(
+            _range(first0, last0),
+            _range(first1, last1),
+        ).encode('utf-8')
+
+        i, j = first0, first1
+        for line0, line1, deleted, inserted in hunk:
+            while i < line0:
+                yield from _line(b' ', lines0[i])
+                i += 1
+                j += 1
+            for i in range(i, i + deleted):
+                yield from _line(b'-', lines0[i])
+            i = line0 + deleted
+            for j in range(j, j + inserted):
+                yield from _line(b'+', lines1[j])
+            j = line1 + inserted
+        while i <= last0:
+            yield from _line(b' ', lines0[i])
+            i += 1
+
+
+def _line(prefix, line):
+    if line.endswith(b'\n'):
+        yield prefix + line
+    else:
+        yield prefix + line + b'\n'
+        yield NO_NEWLINE
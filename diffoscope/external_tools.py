@@ -121,6 +121,7 @@ EXTERNAL_TOOLS = {
         'debian': 'jsbeautifier',
         'arch': 'python-jsbeautifier',
     },
+    'lipo': {},
     'llvm-bcanalyzer': {
         'debian': 'llvm',
         'arch': 'llvm',
@@ -170,6 +171,7 @@ EXTERNAL_TOOLS = {
     'oggDump': {
         'debian': 'oggvideotools',
     },
+    'otool': {},
     'pgpdump': {
         'debian': 'pgpdump',
         'arch': 'pgpdump',
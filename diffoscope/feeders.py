@@ -22,6 +22,7 @@ import hashlib
 import logging
 import subprocess
 
+from .cache import OutputCache
 from .config import Config
 from .profiling import profile
 
@@ -29,12 +30,21 @@ logger = logging.getLogger(__name__)
 
 DIFF_CHUNK = 4096
 
+# Lines are passed on in batches of about this size
+FEEDER_CHUNK = 65536
+
+
+# A feeder is a generator function yielding the bytes diff(1) should compare
+# and returning whether they end with a newline. See diff.FeederReader.
+
 
 def from_raw_reader(in_file, filter=lambda buf: buf):
-    def feeder(out_file):
+    def feeder():
         max_lines = Config().max_diff_input_lines
         end_nl = False
         line_count = 0
+        out = []
+        out_size = 0
 
         # If we have a maximum size, hash the content as we go along so we can
         # display a nicer message.
@@ -43,31 +53,95 @@ def from_raw_reader(in_file, filter=lambda buf: buf):
             h = hashlib.sha1()
 
         for buf in in_file:
+            if not isinstance(buf, (bytes, str)):
+                # Nothing to read yet; pass on what we have so far and what
+                # we are waiting for
+                if out:
+                    yield b''.join(out)
+                    out, out_size = [], 0
+                yield buf
+                continue
+
             line_count += 1
-            out = filter(buf)
+            filtered = filter(buf)
 
             if h is not None:
-                h.update(out)
+                h.update(filtered)
 
             if line_count < max_lines:
-                out_file.write(out)
-                # very long lines can sometimes interact negatively with
-                # python buffering; force a flush here to avoid this,
-                # see https://bugs.debian.org/870049
-                out_file.flush()
+                out.append(filtered)
+                out_size += len(filtered)
+                if out_size >= FEEDER_CHUNK:
+                    yield b''.join(out)
+                    out, out_size = [], 0
             if buf:
                 end_nl = buf[-1] == '\n'
 
+        if out:
+            yield b''.join(out)
+
         if h is not None and line_count >= max_lines:
-            out_file.write("[ Too much input for diff (SHA1: {}) ]\n".format(
+            yield "[ Too much input for diff (SHA1: {}) ]\n".format(
                 h.hexdigest(),
-            ).encode('utf-8'))
+            ).encode('utf-8')
             end_nl = True
 
         return end_nl
     return feeder
 
 
+def from_raw_chunks(in_file):
+    """
+    Like from_raw_reader() without a filter, but passes on the output as it
+    comes instead of line by line.
+    """
+
+    def feeder():
+        max_lines = Config().max_diff_input_lines
+        line_count = 0
+        last = b''
+
+        h = None
+        if max_lines < float('inf'):
+            h = hashlib.sha1()
+
+        for buf in in_file:
+            if not isinstance(buf, bytes):
+                yield buf
+                continue
+
+            if h is not None:
+                h.update(buf)
+
+            # Pass on the lines before the max_lines-th one, which may have
+            # started in a previous chunk.
+            remaining = max_lines - 1 - line_count
+            newlines = buf.count(b'\n')
+            if newlines < remaining:
+                yield buf
+            elif remaining > 0:
+                end = -1
+                for _ in range(int(remaining)):
+                    end = buf.index(b'\n', end + 1)
+                yield buf[:end + 1]
+
+            line_count += newlines
+            if buf:
+                last = buf
+
+        if last[-1:] not in (b'', b'\n'):
+            line_count += 1
+
+        if h is not None and line_count >= max_lines:
+            yield "[ Too much input for diff (SHA1: {}) ]\n".format(
+                h.hexdigest(),
+            ).encode('utf-8')
+            return True
+
+        return last[-1:] == b'\n'
+    return feeder
+
+
 def from_text_reader(in_file, filter=lambda text_buf: text_buf):
     def encoding_filter(text_buf):
         return filter(text_buf).encode('utf-8')
@@ -75,35 +149,93 @@ def from_text_reader(in_file, filter=lambda text_buf: text_buf):
 
 
 def from_command(command):
-    def feeder(out_file):
+    def feeder():
+        writer = None
+        key = OutputCache().key(command)
+        if key is not None:
+            cached = OutputCache().get(key)
+            if cached is not None:
+                logger.debug("Using cached output of %s",
+                             command.shell_cmdline())
+                end_nl = yield from from_cache(command, *cached)()
+                return end_nl
+            writer = OutputCache().writer(key, command)
+
+        if command.has_filter():
+            reader = from_raw_reader(command.stdout, command.filter)
+        else:
+            reader = from_raw_chunks(command.stdout_chunks)
+        if writer is not None:
+            reader = tee(reader, writer)
+
         with profile('command', command.cmdline()[0]):
-            feeder = from_raw_reader(
-                command.stdout,
-                command.filter,
-            )
-            end_nl = feeder(out_file)
-            if command.poll() is None:
-                command.terminate()
-            returncode = command.wait()
-        if returncode not in (0, -signal.SIGTERM):
-            raise subprocess.CalledProcessError(
-                returncode,
-                command.cmdline(),
-                output=command.stderr.getvalue(),
-            )
+            try:
+                command.start()
+                finished = False
+                try:
+                    end_nl = yield from reader()
+                    finished = True
+                finally:
+                    # Once it has closed its output it is about to exit, so
+                    # wait for its status rather than racing it.
+                    if not finished and command.poll() is None:
+                        command.terminate()
+                    returncode = command.wait()
+                if returncode not in (0, -signal.SIGTERM):
+                    raise subprocess.CalledProcessError(
+                        returncode,
+                        command.cmdline(),
+                        output=command.stderr.getvalue(),
+                    )
+                if writer is not None and returncode == 0:
+                    writer.commit(end_nl, command.stderr.getvalue())
+            finally:
+                if writer is not None:
+                    writer.abort()
         return end_nl
     return feeder
 
 
+def from_cache(command, f, meta):
+    def feeder():
+        command.use_cached_output(
+            meta['stderr'].encode('utf-8', errors='surrogateescape'),
+        )
+        with f:
+            for buf in iter(lambda: f.read(FEEDER_CHUNK), b''):
+                yield buf
+        return meta['end_nl']
+    return feeder
+
+
+def tee(in_feeder, writer):
+    """
+    Pass on the output of a feeder, also writing it to `writer`.
+    """
+
+    def feeder():
+        gen = in_feeder()
+        while True:
+            try:
+                buf = next(gen)
+            except StopIteration as exc:
+                return exc.value
+            if isinstance(buf, bytes):
+                writer.write(buf)
+            yield buf
+    return feeder
+
+
 def from_text(content):
-    def feeder(f):
+    def feeder():
         for offset in range(0, len(content), DIFF_CHUNK):
-            f.write(content[offset:offset + DIFF_CHUNK].encode('utf-8'))
+            yield content[offset:offset + DIFF_CHUNK].encode('utf-8')
         return content and content[-1] == '\n'
     return feeder
 
 
 def empty():
-    def feeder(f):
+    def feeder():
+        yield from ()
         return False
     return feeder
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Compares binary files, giving the same output as `diff -aU7` on their xxd(1)
+hexdumps without running either.
+
+Every line of a hexdump starts with its offset, so a line can only ever be the
+same as the line at the same offset in the other file. The longest common
+subsequence of the two hexdumps is therefore made of exactly those lines, and
+we find them by comparing the files a block at a time, only looking at the
+individual lines of the blocks which differ.
+"""
+
+import os
+import mmap
+import contextlib
+
+from . import diffseq
+
+LINE_SIZE = 16
+
+# Compare this much at once, and then smaller parts of the blocks that differ.
+BLOCK_SIZES = (1 << 20, 1 << 12, LINE_SIZE)
+
+
+@contextlib.contextmanager
+def open_data(path):
+    """
+    Map the contents of `path` into memory.
+    """
+
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # Also covers /dev/null for missing files
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+
+def xxd_line(data, offset):
+    line = data[offset:offset + LINE_SIZE]
+    hex = line.hex()
+    return '{:08x}: {:<39}  {}\n'.format(
+        offset,
+        ' '.join(hex[x:x + 4] for x in range(0, len(hex), 4)),
+        ''.join(chr(x) if 0x20 <= x < 0x7f else '.' for x in line),
+    ).encode('ascii')
+
+
+class XxdLines(object):
+    """
+    The lines of the hexdump of `data`, formatted when accessed.
+    """
+
+    def __init__(self, data, count):
+        self.data = data
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        return xxd_line(self.data, index * LINE_SIZE)
+
+
+def _differing_lines(data1, data2, start, end, sizes=BLOCK_SIZES):
+    size = sizes[0]
+    for offset in range(start, end, size):
+        limit = min(offset + size, end)
+        if data1[offset:limit] == data2[offset:limit]:
+            continue
+        if len(sizes) == 1:
+            yield offset // LINE_SIZE
+        else:
+            yield from _differing_lines(data1, data2, offset, limit, sizes[1:])
+
+
+def _changes(data1, data2):
+    """
+    Yield the runs of differing lines as (line, deleted, inserted).
+    """
+
+    if len(data1) == len(data2):
+        end = len(data1)
+    else:
+        # The last line of the shorter file cannot be the same as the line in
+        # the other, so only whole lines are compared.
+        end = min(len(data1), len(data2)) // LINE_SIZE * LINE_SIZE
+
+    start = count = 0
+    for line in _differing_lines(data1, data2, 0, end):
+        if count and line == start + count:
+            count += 1
+            continue
+        if count:
+            yield start, count, count
+        start, count = line, 1
+
+    # Lines only in one of the files join any run just before them
+    tail = -(-end // LINE_SIZE)
+    deleted = -(-len(data1) // LINE_SIZE) - tail
+    inserted = -(-len(data2) // LINE_SIZE) - tail
+    if count and start + count == tail:
+        yield start, count + deleted, count + inserted
+    else:
+        if count:
+            yield start, count, count
+        if deleted or inserted:
+            yield tail, deleted, inserted
+
+
+class HexDiff(object):
+    """
+    Iterate over the lines of the unified diff between the hexdumps of `data1`
+    and `data2`, with at most `max_lines` lines removed and added in total.
+    Beyond that, the files are treated as if they were cut short at
+    `truncated_at`.
+    """
+
+    def __init__(self, data1, data2, max_lines=float('inf'), context=7):
+        self.data1 = data1
+        self.data2 = data2
+        self.max_lines = max_lines
+        self.context = context
+        self.truncated_at = None
+
+    def __iter__(self):
+        changes = []
+        remaining = self.max_lines
+        lines1 = -(-len(self.data1) // LINE_SIZE)
+        lines2 = -(-len(self.data2) // LINE_SIZE)
+
+        for line, deleted, inserted in _changes(self.data1, self.data2):
+            if deleted + inserted > remaining:
+                # Keep as many lines of both sides as fit
+                fewer, more = sorted((deleted, inserted))
+                if 2 * fewer >= remaining:
+                    keep = int(remaining // 2)
+                else:
+                    keep = int(min(more, remaining - fewer))
+                deleted, inserted = min(deleted, keep), min(inserted, keep)
+                lines1 = min(lines1, line + keep)
+                lines2 = min(lines2, line + keep)
+                self.truncated_at = (line + keep) * LINE_SIZE
+                if keep:
+                    changes.append((line, line, deleted, inserted))
+                break
+            remaining -= deleted + inserted
+            changes.append((line, line, deleted, inserted))
+
+        yield from diffseq.unified_hunks(
+            changes,
+            XxdLines(self.data1, lines1),
+            XxdLines(self.data2, lines2),
+            self.context,
+        )
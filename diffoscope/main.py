@@ -35,6 +35,9 @@ from .locale import set_locale
 from .logging import setup_logging
 from .progress import ProgressManager, Progress
 from .profiling import ProfileManager, profile
+from .cache import OutputCache
+from .scheduler import Scheduler
+from .resultcache import ResultCache
 from .tempfiles import clean_all_temp_files
 from .difference import Difference
 from .comparators import ComparatorManager
@@ -223,6 +226,28 @@ def create_parser():
                         help='Force recursing into the depths of file formats '
                         'even if files have the same content, only really '
                         'useful for debugging diffoscope. Default: %(default)s')
+    group3.add_argument('--jobs', '-j', metavar='N', type=int,
+                        help='Run up to N comparisons at once: members of a '
+                        'container (or directory) are compared in separate '
+                        'worker processes, and independent external commands '
+                        '(eg. readelf on ELF files) are run concurrently, at '
+                        'most N at a time. Output is identical to a serial '
+                        'run. When run from a GNU make recipe with a '
+                        'jobserver, external commands share its job slots '
+                        'instead. Default: %(default)s',
+                        default=Config().jobs)
+    group3.add_argument('--cache-dir', metavar='DIR',
+                        help='Keep the output of external tools, and the '
+                        'results of comparing pairs of files, in DIR and '
+                        'reuse them in later runs for files with the same '
+                        'contents, eg. when comparing against the same '
+                        'baseline again. Default: no cache')
+    group3.add_argument('--max-cache-size', metavar='BYTES', type=int,
+                        help='Maximum size of each of the tool output and '
+                        'comparison result caches in --cache-dir, beyond '
+                        'which the least recently used entries are removed. '
+                        '(0 to disable, default: %d)' %
+                        Config().max_cache_size, default=None)
 
     group4 = parser.add_argument_group('information commands')
     group4.add_argument('--help', '-h', action='help',
@@ -276,7 +301,7 @@ class ListToolsAction(argparse.Action):
     def __call__(self, parser, namespace, os_override, option_string=None):
         # Ensure all comparators are imported so tool_required.all is
         # populated.
-        ComparatorManager().reload()
+        ComparatorManager().load_all()
 
         print("External-Tools-Required: ", end='')
         print(', '.join(sorted(tool_required.all)))
@@ -301,7 +326,7 @@ class ListDebianSubstvarsAction(argparse._StoreTrueAction):
     def __call__(self, *args, **kwargs):
         # Ensure all comparators are imported so tool_required.all is
         # populated.
-        ComparatorManager().reload()
+        ComparatorManager().load_all()
 
         tools = set()
         for x in tool_required.all:
@@ -360,6 +385,12 @@ def run_diffoscope(parsed_args):
     maybe_set_limit(Config(), parsed_args, "max_diff_input_lines")
     Config().max_container_depth = parsed_args.max_container_depth
     Config().force_details = parsed_args.force_details
+    Config().jobs = parsed_args.jobs
+    Scheduler().setup(parsed_args.jobs)
+    Config().cache_dir = parsed_args.cache_dir
+    maybe_set_limit(Config(), parsed_args, "max_cache_size")
+    OutputCache().setup(Config().cache_dir, Config().max_cache_size)
+    ResultCache().setup(Config().cache_dir, Config().max_cache_size)
     Config().fuzzy_threshold = parsed_args.fuzzy_threshold
     Config().new_file = parsed_args.new_file
     Config().excludes = parsed_args.excludes
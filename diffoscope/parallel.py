@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import signal
+import logging
+import itertools
+import collections
+import concurrent.futures
+import traceback
+import multiprocessing
+import multiprocessing.connection
+
+from .config import Config
+from .progress import ProgressManager
+from .scheduler import Scheduler
+from .tempfiles import clean_all_temp_files, reset_temp_files
+
+logger = logging.getLogger(__name__)
+
+_IN_WORKER = False
+
+
+class WorkerError(Exception):
+    pass
+
+
+def in_worker():
+    """
+    Whether we are in a worker process, whose state is lost when it exits.
+    """
+    return _IN_WORKER
+
+
+def _terminated(signum, frame):
+    # The slots we hold may be tokens of a GNU make jobserver, which would
+    # otherwise be lost for the rest of its run.
+    Scheduler().release_all()
+    clean_all_temp_files()
+    os._exit(128 + signum)
+
+
+def _run_job(conn, fn, args):
+    global _IN_WORKER
+    _IN_WORKER = True
+
+    # The progress observers, the temporary files and the job slots we
+    # inherited belong to the parent process; don't draw over the first,
+    # remove the second or give back the last.
+    ProgressManager().reset()
+    reset_temp_files()
+    Scheduler().forked()
+
+    signal.signal(signal.SIGTERM, _terminated)
+
+    try:
+        try:
+            result = (True, fn(*args))
+        except BaseException as exc:
+            result = (False, exc)
+
+        try:
+            conn.send(result)
+        except Exception:
+            # The exception (or, less likely, the result) is not picklable
+            conn.send((False, WorkerError(traceback.format_exc())))
+    finally:
+        conn.close()
+        clean_all_temp_files()
+
+
+def parallel_starmap(fn, iterable):
+    """
+    Like itertools.starmap, but run each call in a forked worker process when
+    more than one job is configured.
+
+    Results are yielded in the same order as the input so that the output is
+    identical to the serial version. `iterable` is consumed lazily, with at
+    most Config().jobs items running or waiting for earlier ones to finish,
+    so that any progress reported while generating it remains meaningful.
+
+    Workers never fork workers of their own; nested calls run serially.
+    """
+    jobs = Config().jobs
+
+    if jobs <= 1 or _IN_WORKER:
+        return itertools.starmap(fn, iterable)
+
+    return _parallel_starmap(fn, iterable, jobs)
+
+
+def _parallel_starmap(fn, iterable, jobs):
+    # Forking means neither `fn` nor its arguments need to be picklable; only
+    # the results are sent back to us.
+    ctx = multiprocessing.get_context('fork')
+
+    pending = enumerate(iterable)
+    running = {}
+    results = {}
+    next_idx = 0
+    exhausted = False
+
+    try:
+        while True:
+            # Results we cannot yield yet count towards the limit too, so
+            # that a slow job does not let the others run far ahead of it.
+            while not exhausted and len(running) + len(results) < jobs:
+                try:
+                    idx, args = next(pending)
+                except StopIteration:
+                    exhausted = True
+                    break
+                reader, writer = ctx.Pipe(duplex=False)
+                process = ctx.Process(
+                    target=_run_job,
+                    args=(writer, fn, args),
+                    daemon=True,
+                )
+                process.start()
+                writer.close()
+                # Hold on to the arguments until the job is done; if they were
+                # garbage-collected here, File.cleanup() would remove their
+                # temporary files from underneath the worker.
+                running[reader] = (idx, process, args)
+
+            while next_idx in results:
+                ok, value = results.pop(next_idx)
+                next_idx += 1
+                if not ok:
+                    raise value
+                yield value
+
+            if not running:
+                if exhausted:
+                    return
+                continue
+
+            for reader in multiprocessing.connection.wait(list(running)):
+                idx, process, _ = running.pop(reader)
+                try:
+                    results[idx] = reader.recv()
+                except EOFError:
+                    results[idx] = (False, WorkerError(
+                        "Worker process {} died unexpectedly".format(
+                            process.pid,
+                        ),
+                    ))
+                reader.close()
+                process.join()
+    finally:
+        for reader, (_, process, _) in running.items():
+            process.terminate()
+            process.join()
+            reader.close()
+
+
+def threaded_starmap(fn, iterable):
+    """
+    Like itertools.starmap, but run up to Config().jobs calls at once in a
+    thread pool, yielding results in the same order as the input.
+
+    Only suitable for calls that spend their time waiting on external tools;
+    in particular, `fn` must not report any progress itself.
+    """
+    jobs = Config().jobs
+
+    if jobs <= 1:
+        return itertools.starmap(fn, iterable)
+
+    return _threaded_starmap(fn, iterable, jobs)
+
+
+def _threaded_starmap(fn, iterable, jobs):
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        running = collections.deque()
+        for args in iterable:
+            if len(running) >= jobs:
+                yield running.popleft().result()
+            running.append(executor.submit(fn, *args))
+        while running:
+            yield running.popleft().result()
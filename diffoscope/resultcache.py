@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import re
+import json
+import hashlib
+import logging
+import tempfile
+import functools
+import collections
+
+from . import VERSION
+from .cache import DirectoryCache, tool_fingerprint
+from .tools import REMAPPED_TOOL_NAMES, get_tool_name
+from .config import Config
+from .parallel import in_worker
+from .difference import Difference, VisualDifference
+from .external_tools import EXTERNAL_TOOLS
+
+logger = logging.getLogger(__name__)
+
+# Returned by ResultCache.get() when nothing was found, as None means that
+# there were no differences.
+MISSING = object()
+
+# Results are copied when they are kept in memory, so only keep those whose
+# details have no further details, eg. not of archives within archives, as
+# their members are kept anyway. Otherwise the differences deep in a tree
+# would be copied again at every level above them.
+MAX_KEPT_HEIGHT = 1
+
+# Keep at most this many results in memory, dropping the least recently used
+MAX_KEPT_RESULTS = 4096
+
+# Settings which change the result of comparing the same files
+CONFIG_KEYS = (
+    'max_diff_input_lines',
+    'max_diff_block_lines_saved',
+    'fuzzy_threshold',
+    'new_file',
+    'excludes',
+    'exclude_commands',
+    'exclude_directory_metadata',
+    'compute_visual_diffs',
+    'max_container_depth',
+    'force_details',
+)
+
+
+def tool_fingerprints():
+    """
+    Identify the installed versions of all the tools we may run, as results
+    depend on them too.
+    """
+
+    return _tool_fingerprints(
+        os.environ.get('PATH'),
+        tuple(sorted(REMAPPED_TOOL_NAMES.items())),
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def _tool_fingerprints(path, remapped):
+    return [
+        (x, tool_fingerprint(get_tool_name(x))) for x in sorted(EXTERNAL_TOOLS)
+    ]
+
+
+def difference_to_json(difference):
+    if difference is None:
+        return None
+
+    return {
+        'source1': difference.source1,
+        'source2': difference.source2,
+        'unified_diff': difference.unified_diff,
+        'comments': difference.comments,
+        'has_internal_linenos': difference.has_internal_linenos,
+        'details': [difference_to_json(x) for x in difference.details],
+        'visuals': [
+            [x.data_type, x.content, x.source] for x in difference.visuals
+        ],
+    }
+
+
+def difference_from_json(raw):
+    if raw is None:
+        return None
+
+    return Difference(
+        raw['unified_diff'],
+        raw['source1'],
+        raw['source2'],
+        comment=raw['comments'],
+        has_internal_linenos=raw['has_internal_linenos'],
+        details=[difference_from_json(x) for x in raw['details']],
+        visuals=[VisualDifference(*x) for x in raw['visuals']],
+    )
+
+
+def renamer(old, new):
+    """
+    Return a function replacing `old` by `new` in the names of files.
+    """
+
+    def rename(name):
+        if old == new:
+            return name
+        if name == old:
+            return new
+        if name.startswith(old + '/'):
+            return new + name[len(old):]
+        return name
+    return rename
+
+
+def mentions(difference, paths):
+    """
+    Whether the output in `difference` mentions any of `paths`.
+    """
+
+    if difference is None:
+        return False
+
+    texts = [difference.unified_diff or ''] + difference.comments + [
+        x.content for x in difference.visuals
+    ]
+    if any(paths.search(x) for x in texts):
+        return True
+
+    return any(mentions(x, paths) for x in difference.details)
+
+
+def identity(name):
+    return name
+
+
+def height_at_most(difference, height):
+    """
+    Whether `difference` has no more than `height` levels of details, without
+    looking any deeper than that.
+    """
+
+    if difference is None or not difference.details:
+        return True
+    if height == 0:
+        return False
+    return all(height_at_most(x, height - 1) for x in difference.details)
+
+
+class ResultCache(object):
+    """
+    Keeps the results of comparing pairs of files, so that comparing the same
+    contents again, eg. another copy of a file in a different package, reuses
+    them. With --cache-dir, they are also stored there for later runs.
+    """
+
+    _singleton = {}
+
+    def __init__(self):
+        self.__dict__ = self._singleton
+
+        if not self._singleton:
+            self.cache = None
+            self.results = collections.OrderedDict()
+
+    def setup(self, cache_dir, max_size):
+        self.cache = None
+        self.results = collections.OrderedDict()
+        if cache_dir is not None:
+            self.cache = DirectoryCache(
+                os.path.join(cache_dir, 'results'),
+                max_size,
+            )
+
+    def key(self, file1, file2, source):
+        """
+        Return the key for comparing the (specialized) files, or None if the
+        result should not be reused.
+        """
+
+        digests = (file1.content_digest, file2.content_digest)
+        if None in digests:
+            return None
+
+        depths = tuple(
+            x.container.depth if x.container is not None else -1
+            for x in (file1, file2)
+        )
+
+        return (
+            digests,
+            (file1.__class__.__name__, file2.__class__.__name__),
+            depths,
+            str(source),
+        )
+
+    def filename(self, key):
+        key = json.dumps([
+            VERSION,
+            key,
+            [getattr(Config(), x) for x in CONFIG_KEYS],
+            sorted(REMAPPED_TOOL_NAMES.items()),
+            os.environ.get('PATH'),
+            tool_fingerprints(),
+        ], default=str)
+
+        return self.cache.filename(
+            hashlib.sha256(key.encode('utf-8')).hexdigest(),
+            '.json',
+        )
+
+    def get(self, key, file1, file2):
+        """
+        Return the difference between the files, rebased onto their names, if
+        we know it already, or MISSING.
+        """
+
+        try:
+            name1, name2, difference = self.results[key]
+            self.results.move_to_end(key)
+        except KeyError:
+            if self.cache is None:
+                return MISSING
+            filename = self.filename(key)
+            try:
+                with open(filename) as f:
+                    raw = json.load(f)
+            except (OSError, ValueError):
+                return MISSING
+            self.cache.touch(filename)
+            name1, name2 = raw['name1'], raw['name2']
+            difference = difference_from_json(raw['difference'])
+            if self.should_keep(difference):
+                self.keep(key, name1, name2, difference)
+
+        logger.debug("Reusing result of comparing %s and %s for %s and %s",
+                     name1, name2, file1.name, file2.name)
+
+        if difference is None:
+            return None
+
+        # Always return a copy as callers may add to it
+        return difference.map_sources(
+            renamer(name1, file1.name),
+            renamer(name2, file2.name),
+        )
+
+    def should_keep(self, difference):
+        # What workers keep is lost when they exit
+        if in_worker():
+            return False
+        return height_at_most(difference, MAX_KEPT_HEIGHT)
+
+    def keep(self, key, name1, name2, difference):
+        self.results[key] = name1, name2, difference
+        self.results.move_to_end(key)
+        while len(self.results) > MAX_KEPT_RESULTS:
+            self.results.popitem(last=False)
+
+    def put(self, key, file1, file2, difference):
+        keep = self.should_keep(difference)
+        if not keep and self.cache is None:
+            return
+
+        # Where the files (and anything we unpacked from them) are differs
+        # for other copies of them, and in later runs.
+        paths = re.compile('|'.join(re.escape(x) for x in (
+            file1.path,
+            file2.path,
+            os.path.join(tempfile.gettempdir(), 'tmp'),
+        )))
+        if mentions(difference, paths):
+            logger.debug("Not keeping result mentioning %s or %s",
+                         file1.path, file2.path)
+            return
+
+        if keep:
+            kept = difference
+            if kept is not None:
+                # Callers may add to the original
+                kept = kept.map_sources(identity, identity)
+            self.keep(key, file1.name, file2.name, kept)
+
+        if self.cache is None:
+            return
+
+        data = json.dumps({
+            'name1': file1.name,
+            'name2': file2.name,
+            'difference': difference_to_json(difference),
+        }).encode('utf-8')
+
+        with self.cache.tempfile() as f:
+            f.write(data)
+        os.replace(f.name, self.filename(key))
+        self.cache.added(len(data))
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import re
+import stat
+import select
+import logging
+import threading
+import contextlib
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+# Matches both the current (GNU make >= 4.2) and the older spelling of the
+# option; a named FIFO is used instead of inherited descriptors since 4.4.
+JOBSERVER_RE = re.compile(
+    r'--jobserver-(?:auth|fds)=(?:fifo:(?P<fifo>\S+)|(?P<r>\d+),(?P<w>\d+))',
+)
+
+
+class _Pool(object):
+    """
+    A pipe holding one byte for every free job slot, in the manner of the GNU
+    make jobserver. As the descriptors are inherited by our forked worker
+    processes, the limit applies to all of them at once.
+    """
+
+    def __init__(self, read_fd, write_fd, nonblocking):
+        self.read_fd = read_fd
+        self.write_fd = write_fd
+        # We must not change the flags of descriptors shared with make, so
+        # reads from those may block after select() if someone else was
+        # quicker than us. That only means waiting for the next free slot.
+        self.nonblocking = nonblocking
+
+    def take(self):
+        try:
+            return os.read(self.read_fd, 1)
+        except BlockingIOError:
+            return None
+
+    def give(self, token):
+        os.write(self.write_fd, token)
+
+
+class _Slot(object):
+    def __init__(self, pool, token):
+        self.pool = pool
+        self.token = token
+
+
+# Handed out when there is no limit on the number of concurrent jobs.
+_UNLIMITED = _Slot(None, None)
+
+
+def parse_makeflags(makeflags):
+    """
+    Return the jobserver advertised in a MAKEFLAGS value, either as a pair of
+    descriptors (read, write) or as the path to a named FIFO, or None.
+    """
+
+    matches = list(JOBSERVER_RE.finditer(makeflags or ''))
+    if not matches:
+        return None
+
+    # make appends to the inherited value, so the last one is ours
+    match = matches[-1]
+    if match.group('fifo'):
+        return match.group('fifo')
+    return int(match.group('r')), int(match.group('w'))
+
+
+class Scheduler(object):
+    """
+    Limits how many external tools (or pipelines thereof, such as two commands
+    being compared with diff(1)) run at once across this process, its worker
+    threads and forked worker processes.
+
+    If we were started from a GNU make recipe with a jobserver, its job slots
+    are used in addition to the one make implicitly granted us. Otherwise,
+    there are as many slots as --jobs.
+    """
+
+    _singleton = {}
+
+    def __init__(self):
+        self.__dict__ = self._singleton
+
+        if not self._singleton:
+            self.pools = []
+            self.owned_fds = []
+            self.local = threading.local()
+            self.held = set()
+            self.lock = threading.RLock()
+
+    def setup(self, jobs, makeflags=None):
+        self.reset()
+
+        jobserver = self.join_jobserver(makeflags)
+
+        if jobserver is None:
+            self.pools.append(self.create_pool(jobs))
+        else:
+            # The implicit slot comes first so that we prefer it over taking
+            # one from make.
+            self.pools.extend((self.create_pool(1), jobserver))
+
+    def reset(self):
+        for fd in self.owned_fds:
+            os.close(fd)
+        self.pools = []
+        self.owned_fds = []
+        self.local = threading.local()
+        self.held = set()
+        self.lock = threading.RLock()
+
+    def create_pool(self, size):
+        read_fd, write_fd = os.pipe()
+        os.set_blocking(read_fd, False)
+        os.write(write_fd, b'+' * size)
+        self.owned_fds.extend((read_fd, write_fd))
+        return _Pool(read_fd, write_fd, nonblocking=True)
+
+    def join_jobserver(self, makeflags):
+        if makeflags is None:
+            makeflags = os.environ.get('MAKEFLAGS')
+
+        jobserver = parse_makeflags(makeflags)
+        if jobserver is None:
+            return None
+
+        if isinstance(jobserver, str):
+            try:
+                fd = os.open(jobserver, os.O_RDWR | os.O_NONBLOCK)
+            except OSError as exc:
+                logger.debug("Cannot open jobserver FIFO %s: %s", jobserver, exc)
+                return None
+            self.owned_fds.append(fd)
+            logger.debug("Using jobserver FIFO %s", jobserver)
+            return _Pool(fd, fd, nonblocking=True)
+
+        # make only passes its descriptors on to recipes it knows to be
+        # recursive invocations; otherwise they may be closed or reused.
+        try:
+            if not all(stat.S_ISFIFO(os.fstat(x).st_mode) for x in jobserver):
+                raise OSError("not a pipe")
+        except OSError as exc:
+            logger.debug("Jobserver %s,%s unavailable: %s", *jobserver, exc)
+            return None
+
+        logger.debug("Using jobserver %s,%s", *jobserver)
+        return _Pool(*jobserver, nonblocking=False)
+
+    def acquire(self):
+        """
+        Wait for a free job slot and return it. It must be given back with
+        release(), possibly from another thread.
+        """
+
+        if not self.pools:
+            return _UNLIMITED
+
+        slot = self.take()
+        with self.lock:
+            self.held.add(slot)
+        return slot
+
+    def take(self):
+        while True:
+            for pool in self.pools:
+                if pool.nonblocking:
+                    token = pool.take()
+                    if token:
+                        return _Slot(pool, token)
+
+            readable, _, _ = select.select(
+                [x.read_fd for x in self.pools], [], [],
+            )
+
+            for pool in self.pools:
+                if pool.read_fd not in readable or pool.nonblocking:
+                    continue
+                token = pool.take()
+                if token:
+                    return _Slot(pool, token)
+                # make has gone away; stop waiting on it
+                logger.debug("Jobserver closed")
+                self.pools.remove(pool)
+                break
+
+    def release(self, slot):
+        with self.lock:
+            if slot not in self.held:
+                return
+            self.held.remove(slot)
+            slot.pool.give(slot.token)
+
+    def forked(self):
+        """
+        Forget the slots held in the parent process, which it gives back
+        itself, after forking a worker.
+        """
+
+        self.held = set()
+        self.lock = threading.RLock()
+
+    def release_all(self):
+        """
+        Give back the slots held by any thread, eg. as we are about to be
+        killed and their tokens would otherwise be lost to make.
+        """
+
+        with self.lock:
+            while self.held:
+                slot = self.held.pop()
+                slot.pool.give(slot.token)
+
+    def current(self):
+        """
+        Return the slot held by the calling thread, if any.
+        """
+
+        return getattr(self.local, 'slot', None)
+
+    @contextlib.contextmanager
+    def slot(self):
+        """
+        Hold a job slot for the duration of the block. Nested blocks share the
+        slot of the outermost one.
+        """
+
+        if self.current() is not None:
+            yield
+            return
+
+        self.local.slot = self.acquire()
+        try:
+            yield
+        finally:
+            slot, self.local.slot = self.local.slot, None
+            self.release(slot)
+
+
+def call(*args, **kwargs):
+    with Scheduler().slot():
+        return subprocess.call(*args, **kwargs)
+
+
+def check_call(*args, **kwargs):
+    with Scheduler().slot():
+        return subprocess.check_call(*args, **kwargs)
+
+
+def check_output(*args, **kwargs):
+    with Scheduler().slot():
+        return subprocess.check_output(*args, **kwargs)
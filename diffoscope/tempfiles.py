@@ -22,6 +22,7 @@ import logging
 import tempfile
 
 _DIRS, _FILES = [], []
+_INHERITED = []
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +45,20 @@ def get_temporary_directory(*args, **kwargs):
     return d
 
 
+def reset_temp_files():
+    """
+    Forget about the temporary files and directories created so far, eg. in a
+    forked process where they are still owned by (and used in) the parent.
+    """
+
+    global _DIRS, _FILES
+
+    # Keep a reference so that garbage-collecting them does not remove them
+    # from underneath the parent.
+    _INHERITED.append((_DIRS, _FILES))
+    _DIRS, _FILES = [], []
+
+
 def clean_all_temp_files():
     logger.debug("Cleaning %d temp files", len(_FILES))
 
@@ -25,11 +25,13 @@ from os import mkdir, symlink
 from tempfile import TemporaryDirectory
 
 from diffoscope.tools import tool_required
+from diffoscope.config import Config
 from diffoscope.exc import RequiredToolNotFound
 from diffoscope.difference import Difference
 from diffoscope.comparators.binary import FilesystemFile
 from diffoscope.comparators.utils.file import File
 from diffoscope.comparators.missing_file import MissingFile
+from diffoscope.comparators.utils import compare
 from diffoscope.comparators.utils.compare import Xxd
 
 from ..utils.data import data, init_fixture, get_data, normalize_zeros
@@ -55,6 +57,22 @@ def test_not_same_content(binary1, binary2):
     assert binary1.has_same_content_as(binary2) is False
 
 
+def test_same_content_large_files(tmpdir, monkeypatch):
+    content = os.urandom(1 << 20)
+    paths = [str(tmpdir.join(x)) for x in 'abc']
+    for path in paths:
+        with open(path, 'wb') as f:
+            f.write(content)
+    with open(paths[2], 'r+b') as f:
+        f.seek(1 << 19)
+        f.write(b'x')
+
+    monkeypatch.setattr(File, 'cmp_external', lambda *args: 1 / 0)
+    file1, file2, file3 = [FilesystemFile(x) for x in paths]
+    assert file1.has_same_content_as(file2) is True
+    assert file1.has_same_content_as(file3) is False
+
+
 def test_guess_file_type():
     assert File.guess_file_type(TEST_FILE1_PATH) == 'data'
 
@@ -92,6 +110,12 @@ def test_compare_non_existing_with_xxd(binary1):
     assert difference.source2 == '/nonexisting'
 
 
+@skip_unless_tools_exist('xxd')
+def test_compare_with_xxd_excluded(monkeypatch, binary1, binary2):
+    monkeypatch.setattr(Config(), 'exclude_commands', ['^xxd'])
+    assert binary1.compare_bytes(binary2) is None
+
+
 @pytest.fixture
 def xxd_not_found(monkeypatch):
     def mock_cmdline(self):
@@ -105,11 +129,35 @@ def test_no_differences_without_xxd(xxd_not_found, binary1):
 
 
 def test_compare_without_xxd(xxd_not_found, binary1, binary2):
+    difference = binary1.compare(binary2)
+    expected_diff = get_data('binary_expected_diff')
+    assert difference.unified_diff == expected_diff
+
+
+def test_compare_without_xxd_or_mmap(xxd_not_found, monkeypatch, binary1, binary2):
+    def mock_open_data(path):
+        raise OSError('mmap not supported')
+    monkeypatch.setattr(compare, 'open_data', mock_open_data)
     difference = binary1.compare(binary2)
     expected_diff = get_data('binary_hexdump_expected_diff')
     assert difference.unified_diff == expected_diff
 
 
+def test_compare_large_binary(monkeypatch, tmpdir):
+    monkeypatch.setattr(Config(), 'max_diff_input_lines', 10)
+    path1 = str(tmpdir.join('large1'))
+    path2 = str(tmpdir.join('large2'))
+    data = bytes(range(256)) * 1024
+    with open(path1, 'wb') as f:
+        f.write(data)
+    with open(path2, 'wb') as f:
+        f.write(data[:100000] + b'\0' * 1000 + data[101000:])
+    difference = FilesystemFile(path1).compare_bytes(FilesystemFile(path2))
+    assert difference.unified_diff.startswith('@@ -6244,12 +6244,12 @@\n')
+    assert difference.unified_diff.count('\n-') == 5
+    assert 'offset 0x186f0 not shown' in difference.comment
+
+
 def test_with_compare_details():
     d = Difference('diff', TEST_FILE1_PATH, TEST_FILE2_PATH, source='source')
 
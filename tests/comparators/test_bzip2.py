@@ -25,7 +25,6 @@ from diffoscope.comparators.binary import FilesystemFile
 from diffoscope.comparators.utils.specialize import specialize
 
 from ..utils.data import load_fixture, get_data
-from ..utils.tools import skip_unless_tools_exist
 from ..utils.nonexisting import assert_non_existing
 
 
@@ -47,13 +46,11 @@ def differences(bzip1, bzip2):
     return bzip1.compare(bzip2).details
 
 
-@skip_unless_tools_exist('bzip2')
 def test_content_source(differences):
     assert differences[0].source1 == 'test1'
     assert differences[0].source2 == 'test2'
 
 
-@skip_unless_tools_exist('bzip2')
 def test_content_source_without_extension(tmpdir, bzip1, bzip2):
     path1 = str(tmpdir.join('test1'))
     path2 = str(tmpdir.join('test2'))
@@ -66,12 +63,10 @@ def test_content_source_without_extension(tmpdir, bzip1, bzip2):
     assert differences[0].source2 == 'test2-content'
 
 
-@skip_unless_tools_exist('bzip2')
 def test_content_diff(differences):
     expected_diff = get_data('text_ascii_expected_diff')
     assert differences[0].unified_diff == expected_diff
 
 
-@skip_unless_tools_exist('bzip2')
 def test_compare_non_existing(monkeypatch, bzip1):
     assert_non_existing(monkeypatch, bzip1)
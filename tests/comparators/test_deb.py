@@ -22,7 +22,8 @@ import pytest
 import diffoscope.comparators
 
 from diffoscope.config import Config
-from diffoscope.comparators.deb import DebFile, Md5sumsFile, DebDataTarFile
+from diffoscope.comparators.deb import DebFile, Md5sumsFile, DebDataTarFile, \
+    DebTarContainer
 from diffoscope.comparators.binary import FilesystemFile
 from diffoscope.comparators.missing_file import MissingFile
 from diffoscope.comparators.utils.specialize import specialize
@@ -119,6 +120,19 @@ def test_skip_comparison_of_known_identical_files(deb1, deb2, monkeypatch):
     assert './usr/share/doc/test/README.Debian' not in compared
 
 
+def test_known_identical_files_not_extracted(deb1, deb2, monkeypatch):
+    members = set()
+    orig_func = DebTarContainer.write_members
+
+    def probe(self, names):
+        members.update(names)
+        return orig_func(self, names)
+    monkeypatch.setattr(DebTarContainer, 'write_members', probe)
+    deb1.compare(deb2)
+    assert './usr/share/doc/test/README.Debian' not in members
+    assert './usr/share/doc/test/copyright' not in members
+
+
 def test_compare_non_existing(monkeypatch, deb1):
     monkeypatch.setattr(Config(), 'new_file', True)
     difference = deb1.compare(MissingFile('/nonexisting', deb1))
@@ -209,6 +209,26 @@ def test_dot_dsc_internal_diff(dot_dsc_differences):
     assert dot_dsc_differences[1].source1 == 'test_1.tar.gz'
 
 
+@skip_unless_module_exists('debian.deb822')
+def test_dot_dsc_unchecked_checksums_not_trusted(tmpdir, dot_dsc1):
+    # Only the md5sums in Files are checked when recognizing .dsc files
+    with open(TEST_DOT_DSC_FILE1_PATH) as f:
+        stale = f.read().split('Checksums-Sha256:')[1].split('Files:')[0]
+    with open(TEST_DOT_DSC_FILE2_PATH) as f:
+        before, rest = f.read().split('Checksums-Sha256:')
+        after = rest.split('Files:')[1]
+    tmpdir.mkdir('b')
+    dot_dsc_path = str(tmpdir.join('b/test_1.dsc'))
+    with open(dot_dsc_path, 'w') as f:
+        f.write('{}Checksums-Sha256:{}Files:{}'.format(before, stale, after))
+    shutil.copy(TEST_DEB_SRC2_PATH, str(tmpdir.join('b/test_1.tar.gz')))
+    dot_dsc2 = specialize(FilesystemFile(dot_dsc_path))
+    assert isinstance(dot_dsc2, DotDscFile)
+
+    difference = dot_dsc1.compare(dot_dsc2)
+    assert 'test_1.tar.gz' in [x.source1 for x in difference.details]
+
+
 @skip_unless_module_exists('debian.deb822')
 def test_dot_dsc_compare_non_existing(monkeypatch, dot_dsc1):
     monkeypatch.setattr(Config(), 'new_file', True)
@@ -120,6 +120,17 @@ def test_lib_differences(lib_differences):
     assert lib_differences[1].unified_diff == expected_objdump_diff
 
 
+@skip_unless_tools_exist('readelf', 'objdump')
+@skip_if_binutils_does_not_support_x86()
+def test_lib_differences_jobs(monkeypatch, lib1, lib2):
+    def flatten(difference):
+        return [(x.source1, x.unified_diff) for x in difference.traverse_depth()]
+
+    expected = flatten(lib1.compare(lib2))
+    monkeypatch.setattr(Config(), 'jobs', 4)
+    assert flatten(lib1.compare(lib2)) == expected
+
+
 @skip_unless_tools_exist('readelf', 'objdump')
 @skip_if_tool_version_is('readelf', readelf_version, '2.29')
 @skip_if_binutils_does_not_support_x86()
@@ -85,6 +85,14 @@ def test_content_diff(differences):
     assert differences[1].unified_diff == expected_diff
 
 
+def test_compare_truncated(tmpdir, gzip1, gzip2):
+    path = str(tmpdir.join('truncated.gz'))
+    with open(gzip1.path, 'rb') as f, open(path, 'wb') as g:
+        g.write(f.read()[:-16])
+    difference = specialize(FilesystemFile(path)).compare(gzip2)
+    assert difference.comments[0].startswith("Error extracting")
+
+
 def test_compare_non_existing(monkeypatch, gzip1):
     monkeypatch.setattr(Config(), 'new_file', True)
     difference = gzip1.compare(MissingFile('/nonexisting', gzip1))
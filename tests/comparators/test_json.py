@@ -19,7 +19,9 @@
 
 import pytest
 
+from diffoscope.comparators import json
 from diffoscope.comparators.json import JSONFile
+from diffoscope.comparators.utils.specialize import specialize
 
 from ..utils.data import load_fixture, get_data
 from ..utils.nonexisting import assert_non_existing
@@ -40,6 +42,14 @@ def test_invalid(invalid_json):
     assert not isinstance(invalid_json, JSONFile)
 
 
+def test_invalid_parsed_once(monkeypatch, invalid_json):
+    def load(*args, **kwargs):
+        raise AssertionError("Parsed again")
+    monkeypatch.setattr(json.json, 'load', load)
+
+    assert not isinstance(specialize(invalid_json), JSONFile)
+
+
 def test_no_differences(json1):
     assert json1.compare(json1) is None
 
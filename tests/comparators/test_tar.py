@@ -17,11 +17,18 @@
 # You should have received a copy of the GNU General Public License
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
+import io
 import pytest
+import tarfile
+import libarchive
+import collections
 
 from diffoscope.config import Config
 from diffoscope.comparators.tar import TarFile
+from diffoscope.comparators.binary import FilesystemFile
 from diffoscope.comparators.missing_file import MissingFile
+from diffoscope.comparators.utils import libarchive as libarchive_utils
+from diffoscope.comparators.utils.specialize import specialize
 
 from ..utils.data import load_fixture, get_data
 from ..utils.nonexisting import assert_non_existing
@@ -65,6 +72,90 @@ def test_text_file(differences):
     assert differences[1].unified_diff == expected_diff
 
 
+def test_listing_reuses_container(monkeypatch, tar1, tar2):
+    def list_libarchive(path):
+        raise AssertionError("read {} again to list it".format(path))
+    monkeypatch.setattr(
+        libarchive_utils, 'list_libarchive', list_libarchive,
+    )
+
+    tar1.compare(tar2)
+
+
+def test_member_sizes_without_extracting(tar1):
+    sizes = {
+        name: size
+        for name, (_, size) in tar1.as_container.get_adjusted_members_sizes()
+    }
+    assert sizes == {
+        'dir/': 4096,
+        'dir/text': 446,
+        'dir/null': 0,
+        'dir/link': 0,
+    }
+    assert tar1.as_container._extracted == set()
+
+
+def make_tar(path, members):
+    with tarfile.open(path, 'w') as f:
+        for name, content in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            f.addfile(info, io.BytesIO(content))
+    return specialize(FilesystemFile(path))
+
+
+def test_same_members_not_extracted(tmpdir):
+    file1 = make_tar(str(tmpdir.join('a.tar')), {
+        'same': b'same\n',
+        'same-size': b'left\n',
+        'other-size': b'left\n',
+    })
+    file2 = make_tar(str(tmpdir.join('b.tar')), {
+        'same': b'same\n',
+        'same-size': b'rite\n',
+        'other-size': b'right\n',
+    })
+
+    difference = file1.compare(file2)
+
+    assert [x.source1 for x in difference.details[1:]] == \
+        ['same-size', 'other-size']
+    for x in (file1, file2):
+        assert x.as_container._extracted == {'same-size', 'other-size'}
+
+
+@pytest.mark.parametrize('jobs', (1, 4))
+def test_archives_read_twice_at_most(monkeypatch, tmpdir, jobs):
+    monkeypatch.setattr(Config(), 'jobs', jobs)
+    file1 = make_tar(str(tmpdir.join('a.tar')), dict(
+        [('same-{}'.format(x), b'same\n') for x in range(20)] +
+        [('differ-{}'.format(x), b'left\n') for x in range(20)]
+    ))
+    file2 = make_tar(str(tmpdir.join('b.tar')), dict(
+        [('same-{}'.format(x), b'same\n') for x in range(20)] +
+        [('differ-{}'.format(x), b'right\n') for x in range(20)]
+    ))
+
+    # Written to as worker processes can't tell us
+    log = str(tmpdir.join('reads'))
+    orig_func = libarchive.file_reader
+
+    def probe(path, *args, **kwargs):
+        with open(log, 'a') as f:
+            print(path, file=f)
+        return orig_func(path, *args, **kwargs)
+    monkeypatch.setattr(libarchive, 'file_reader', probe)
+
+    difference = file1.compare(file2)
+    assert len(difference.details) == 21
+
+    # Once to scan and hash the members, once to extract those that differ
+    with open(log) as f:
+        reads = collections.Counter(f.read().splitlines())
+    assert reads == {file1.path: 2, file2.path: 2}
+
+
 def test_compare_non_existing(monkeypatch, tar1):
     assert_non_existing(monkeypatch, tar1)
 
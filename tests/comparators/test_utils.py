@@ -18,13 +18,22 @@
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
 import codecs
+import importlib
 import os
+import re
+import random
 import pytest
 import threading
 
 from diffoscope.config import Config
 from diffoscope.difference import Difference
+from diffoscope.comparators import ComparatorManager, Hint, HintIndex
+from diffoscope.comparators.text import TextFile
+from diffoscope.comparators.binary import FilesystemFile
+from diffoscope.comparators.utils import file as utils_file
+from diffoscope.comparators.utils.fuzzy import FuzzyIndex
 from diffoscope.comparators.utils.command import Command
+from diffoscope.comparators.utils.specialize import specialize
 
 from ..utils.data import data, load_fixture
 from ..utils.tools import tools_missing, skip_unless_tools_exist, \
@@ -65,6 +74,169 @@ def skip_unless_tool_is_at_least():
     assert func('cat', version, '4.3').args[0] is False
 
 
+# Comparators with their own recognizes(), whose hints have to be checked
+# against it by hand
+CUSTOM_RECOGNIZES = {
+    'directory.Directory',
+    'missing_file.MissingFile',
+    'symlink.Symlink',
+    'device.Device',
+    'deb.Md5sumsFile',
+    'deb.DebDataTarFile',
+    'elf.ElfSection',
+    'binwalk.BinwalkFile',
+    'json.JSONFile',
+    'xml.XMLFile',
+    'haskell.HiFile',
+    'iso9660.Iso9660File',
+    'ppu.PpuFile',
+    'rdata.RdsFile',
+    'zip.MozillaZipFile',
+    'cbfs.CbfsFile',
+}
+
+
+def recognizers(cls):
+    """
+    Return what File.recognizes() and File.fallback_recognizes() test, each
+    as the extensions a name must all end with and the alternatives for its
+    contents: a file type or the headers it must all start with.
+    """
+
+    alternatives = []
+    if cls.FILE_TYPE_RE:
+        alternatives.append((
+            'file_type',
+            cls.FILE_TYPE_RE.pattern,
+            cls.FILE_TYPE_RE.flags & ~re.UNICODE,
+        ))
+    if cls.FILE_TYPE_HEADER_PREFIX:
+        alternatives.append(('headers', [cls.FILE_TYPE_HEADER_PREFIX]))
+    yield [x for x in [cls.FILE_EXTENSION_SUFFIX] if x], alternatives
+
+    if cls.FALLBACK_FILE_EXTENSION_SUFFIX or \
+            cls.FALLBACK_FILE_TYPE_HEADER_PREFIX:
+        headers = [x for x in (
+            cls.FALLBACK_FILE_TYPE_HEADER_PREFIX,
+            cls.FILE_TYPE_HEADER_PREFIX,
+        ) if x]
+        yield [x for x in (
+            cls.FALLBACK_FILE_EXTENSION_SUFFIX,
+            cls.FILE_EXTENSION_SUFFIX,
+        ) if x], [('headers', headers)] if headers else []
+
+
+def hint_covers(hint, extensions, alternatives):
+    """
+    Whether `hint` matches every file a recognizer from recognizers() does.
+    """
+
+    if hint.extension is not None and \
+            not any(x.endswith(hint.extension) for x in extensions):
+        return False
+
+    if hint.file_type is None and hint.header is None:
+        return True
+
+    def covers(alternative):
+        if alternative[0] == 'file_type':
+            return (hint.file_type, hint.flags) == alternative[1:]
+        return hint.header is not None and \
+            any(x.startswith(hint.header) for x in alternative[1])
+
+    return bool(alternatives) and all(covers(x) for x in alternatives)
+
+
+def test_comparator_hints_match_classes():
+    manager = ComparatorManager()
+
+    names = {x for xs in manager.COMPARATORS for x in xs}
+    assert set(manager.HINTS) <= names
+
+    for index, xs in enumerate(manager.COMPARATORS):
+        hints = manager.hints(index)
+        for name in xs:
+            package, klass_name = name.rsplit('.', 1)
+            try:
+                module = importlib.import_module(
+                    'diffoscope.comparators.{}'.format(package)
+                )
+            except ImportError:
+                continue
+            cls = getattr(module, klass_name)
+
+            # Those without hints are always tried
+            if hints is None:
+                continue
+
+            if cls.recognizes.__func__ is not \
+                    utils_file.File.recognizes.__func__:
+                assert name in CUSTOM_RECOGNIZES
+                continue
+
+            for extensions, alternatives in recognizers(cls):
+                assert any(
+                    hint_covers(x, extensions, alternatives) for x in hints
+                ), name
+
+
+def test_hints_must_be_looser():
+    class Strict(utils_file.File):
+        FILE_TYPE_RE = re.compile(r'^ELF ')
+        FILE_TYPE_HEADER_PREFIX = b'\x7fELF'
+
+    for hint, expected in (
+        (Hint(r'^ELF '), False),
+        (Hint(r'^ELF ', b'\x7fELF'), True),
+        (Hint(r'^ELF ', b'\x7f'), True),
+        (Hint(r'^ELF ', b'\x7fELF', '.so'), False),
+        (Hint(extension='.so'), False),
+        (Hint(), True),
+    ):
+        assert all(
+            hint_covers(hint, *x) for x in recognizers(Strict)
+        ) == expected, hint.__dict__
+
+
+def test_specialize_only_imports_candidates(monkeypatch):
+    manager = ComparatorManager()
+    monkeypatch.setattr(
+        manager,
+        'is_imported',
+        lambda index: index in manager.loaded,
+    )
+
+    assert isinstance(specialize(FilesystemFile(data('text_ascii1'))), TextFile)
+    assert sorted(x.__name__ for x in manager.loaded.values()) == [
+        'Device', 'Directory', 'MissingFile', 'Symlink', 'TextFile',
+    ]
+
+
+def test_hint_index_same_as_testing_all_hints():
+    manager = ComparatorManager()
+    hints = [manager.hints(x) for x in range(len(manager.COMPARATORS))]
+    index = HintIndex(hints)
+
+    for name in sorted(os.listdir(data(''))):
+        file = FilesystemFile(data(name))
+        if file.is_directory():
+            continue
+        found = {}
+        for x, xs in enumerate(hints):
+            if not xs:
+                continue
+            assert index.could_recognize(x, file, found) == \
+                any(y.matches(file) for y in xs), (name, x)
+
+
+def test_specialized_classes_reused():
+    text1 = specialize(FilesystemFile(data('text_ascii1')))
+    text2 = specialize(FilesystemFile(data('text_ascii2')))
+
+    assert isinstance(text1, TextFile)
+    assert text1.__class__ is text2.__class__
+
+
 @skip_unless_module_exists('tlsh')
 def test_fuzzy_matching(fuzzy_tar1, fuzzy_tar2):
     differences = fuzzy_tar1.compare(fuzzy_tar2).details
@@ -81,6 +253,57 @@ def test_fuzzy_matching_only_once(fuzzy_tar1, fuzzy_tar3):
     assert len(differences) == 2
 
 
+@skip_unless_module_exists('tlsh')
+def test_fuzzy_index_same_as_comparing_all():
+    import tlsh
+
+    rnd = random.Random(0)
+    originals = [
+        bytes(rnd.randrange(256) for _ in range(rnd.choice((600, 2000))))
+        for _ in range(5)
+    ]
+    digests = []
+    for x in range(60):
+        content = bytearray(rnd.choice(originals))
+        for _ in range(rnd.choice((0, 1, 10, 100))):
+            content[rnd.randrange(len(content))] = rnd.randrange(256)
+        digests.append(('file{}'.format(x), tlsh.hash(bytes(content))))
+
+    candidates, queries = digests[:40], digests[40:]
+    for threshold in (1, 20, 60, 400):
+        index = FuzzyIndex(candidates)
+        remaining = list(candidates)
+        for _, digest in queries:
+            scores = [
+                (tlsh.diff(digest, x), name) for name, x in remaining
+            ]
+            expected = min(scores, key=lambda x: x[0])
+            if expected[0] >= threshold:
+                expected = None
+            assert index.closest(digest, threshold) == expected
+            if expected is not None:
+                index.remove(expected[1])
+                remaining = [x for x in remaining if x[0] != expected[1]]
+
+
+@skip_unless_module_exists('tlsh')
+def test_prefetch_fuzzy_hashes(monkeypatch, tmpdir):
+    monkeypatch.setattr(Config(), 'jobs', 2)
+    monkeypatch.setattr(utils_file, 'FUZZY_HASH_MIN_BATCH_SIZE', 0)
+
+    rnd = random.Random(0)
+    for x in range(4):
+        tmpdir.join(str(x)).write_binary(
+            bytes(rnd.randrange(256) for _ in range(1000 * x)),
+        )
+    files = [FilesystemFile(str(tmpdir.join(str(x)))) for x in range(4)]
+    utils_file.prefetch_fuzzy_hashes(files)
+
+    expected = [FilesystemFile(x.path).fuzzy_hash for x in files]
+    assert [x._fuzzy_hash for x in files] == expected
+    assert expected[0] is None and None not in expected[1:]
+
+
 fuzzy_tar_in_tar1 = load_fixture('fuzzy-tar-in-tar1.tar')
 fuzzy_tar_in_tar2 = load_fixture('fuzzy-tar-in-tar2.tar')
 
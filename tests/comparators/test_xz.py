@@ -25,7 +25,6 @@ from diffoscope.comparators.binary import FilesystemFile
 from diffoscope.comparators.utils.specialize import specialize
 
 from ..utils.data import load_fixture, get_data
-from ..utils.tools import skip_unless_tools_exist
 from ..utils.nonexisting import assert_non_existing
 
 xz1 = load_fixture('test1.xz')
@@ -46,13 +45,11 @@ def differences(xz1, xz2):
     return xz1.compare(xz2).details
 
 
-@skip_unless_tools_exist('xz')
 def test_content_source(differences):
     assert differences[0].source1 == 'test1'
     assert differences[0].source2 == 'test2'
 
 
-@skip_unless_tools_exist('xz')
 def test_content_source_without_extension(tmpdir, xz1, xz2):
     path1 = str(tmpdir.join('test1'))
     path2 = str(tmpdir.join('test2'))
@@ -65,12 +62,10 @@ def test_content_source_without_extension(tmpdir, xz1, xz2):
     assert difference[0].source2 == 'test2-content'
 
 
-@skip_unless_tools_exist('xz')
 def test_content_diff(differences):
     expected_diff = get_data('text_ascii_expected_diff')
     assert differences[0].unified_diff == expected_diff
 
 
-@skip_unless_tools_exist('xz')
 def test_compare_non_existing(monkeypatch, xz1):
     assert_non_existing(monkeypatch, xz1)
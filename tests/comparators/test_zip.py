@@ -17,9 +17,15 @@
 # You should have received a copy of the GNU General Public License
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
+import shutil
 import pytest
+import zipfile
 
-from diffoscope.comparators.zip import ZipFile, MozillaZipFile
+from diffoscope.difference import Difference
+from diffoscope.comparators.zip import ZipFile, ZipContainer, \
+    MozillaZipFile
+from diffoscope.comparators.binary import FilesystemFile
+from diffoscope.comparators.utils.specialize import specialize
 
 from ..utils.data import load_fixture, get_data
 from ..utils.tools import skip_unless_tools_exist
@@ -42,6 +48,33 @@ def test_no_differences(zip1):
     assert difference is None
 
 
+def test_member_sizes_without_extracting(monkeypatch, zip1):
+    def extract(self, member_name, dest_dir):
+        raise AssertionError("extracted {}".format(member_name))
+    monkeypatch.setattr(ZipContainer, 'extract', extract)
+
+    sizes = {
+        name: size
+        for name, (_, size) in zip1.as_container.get_adjusted_members_sizes()
+    }
+    assert sizes == {'dir/': 4096, 'dir/text': 446}
+
+
+def make_zip(path, members):
+    with zipfile.ZipFile(path, 'w') as f:
+        for name, content in members.items():
+            f.writestr(name, content)
+    return specialize(FilesystemFile(path))
+
+
+def test_same_crc_compared(tmpdir):
+    # Different contents of the same size and CRC32
+    file1 = make_zip(str(tmpdir.join('a.zip')), {'crc': 'vvekwlpxlsfh'})
+    file2 = make_zip(str(tmpdir.join('b.zip')), {'crc': 'duxbdagnvvkn'})
+    difference = file1.compare(file2)
+    assert [x.source1 for x in difference.details] == ['crc']
+
+
 @pytest.fixture
 def differences(zip1, zip2):
     return zip1.compare(zip2).details
@@ -52,6 +85,17 @@ def differences2(zip1, zip3):
     return zip1.compare(zip3).details
 
 
+def test_same_metadata_without_tools(monkeypatch, tmpdir, zip1):
+    path = str(tmpdir.join('copy.zip'))
+    shutil.copy(zip1.path, path)
+
+    def from_command(*args):
+        raise AssertionError("ran {}".format(args[0].__name__))
+    monkeypatch.setattr(Difference, 'from_command', from_command)
+
+    assert zip1.compare_details(specialize(FilesystemFile(path))) == []
+
+
 @skip_unless_tools_exist('zipinfo')
 def test_metadata(differences):
     expected_diff = get_data('zip_zipinfo_expected_diff')
@@ -24,6 +24,7 @@ import subprocess
 from diffoscope.path import set_path
 from diffoscope.locale import set_locale
 from diffoscope.progress import ProgressManager
+from diffoscope.resultcache import ResultCache
 from diffoscope.comparators import ComparatorManager
 
 
@@ -50,6 +51,13 @@ def reset_progress():
     ProgressManager().reset()
 
 
+@pytest.fixture(autouse=True)
+def reset_results():
+    # Tests compare the same files under different conditions, so don't reuse
+    # the results between them.
+    ResultCache().setup(None, 0)
+
+
 def pytest_report_header(config):
     if config.option.verbose == 0:
         return
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import time
+import pytest
+import tarfile
+
+from diffoscope import parallel, resultcache
+from diffoscope.cache import OutputCache, DirectoryCache, DigestingWriter, \
+    file_digest, new_digest
+from diffoscope.difference import Difference
+from diffoscope.resultcache import ResultCache
+from diffoscope.comparators.binary import FilesystemFile
+from diffoscope.comparators.utils import compare
+from diffoscope.comparators.utils.command import Command
+
+from .utils.tools import skip_unless_tools_exist
+
+
+class Cat(Command):
+    def cmdline(self):
+        return ['cat', self.path]
+
+
+class Echo(Command):
+    def cmdline(self):
+        return ['echo', self.path]
+
+
+@pytest.fixture
+def cache(tmpdir):
+    OutputCache().setup(str(tmpdir.join('cache')), 2 ** 20)
+    yield OutputCache()
+    OutputCache().setup(None, 0)
+
+
+@pytest.fixture
+def results(tmpdir):
+    ResultCache().setup(str(tmpdir.join('cache')), 2 ** 20)
+    yield ResultCache()
+    ResultCache().setup(None, 0)
+
+
+@pytest.fixture
+def paths(tmpdir):
+    a = tmpdir.join('a')
+    a.write('a\nb\n')
+    b = tmpdir.join('b')
+    b.write('a\nc\n')
+    return str(a), str(b)
+
+
+def must_not_start(self):
+    raise AssertionError("should have been cached")
+
+
+@skip_unless_tools_exist('cat', 'diff')
+def test_output_cached(cache, paths, monkeypatch):
+    expected = Difference.from_command(Cat, *paths)
+    monkeypatch.setattr(Cat, 'start', must_not_start)
+    difference = Difference.from_command(Cat, *paths)
+    assert difference.unified_diff == expected.unified_diff == \
+        '@@ -1,2 +1,2 @@\n a\n-b\n+c\n'
+
+
+@skip_unless_tools_exist('echo', 'diff')
+def test_output_mentioning_path_not_cached(cache, paths, monkeypatch):
+    Difference.from_command(Echo, *paths)
+    monkeypatch.setattr(Echo, 'start', must_not_start)
+    with pytest.raises(AssertionError):
+        Difference.from_command(Echo, *paths)
+
+
+def compare_paths(path1, path2):
+    return compare.compare_files(FilesystemFile(path1), FilesystemFile(path2))
+
+
+def must_not_compare(*args, **kwargs):
+    raise AssertionError("should have been cached")
+
+
+@skip_unless_tools_exist('diff')
+def test_result_cached(results, paths, tmpdir, monkeypatch):
+    expected = compare_paths(*paths)
+    monkeypatch.setattr(compare, 'compare_specialized_files', must_not_compare)
+
+    # The same contents elsewhere
+    for path, name in zip(paths, ('c', 'd')):
+        tmpdir.join(name).write(open(path).read())
+    path1, path2 = str(tmpdir.join('c')), str(tmpdir.join('d'))
+
+    difference = compare_paths(path1, path2)
+    assert (difference.source1, difference.source2) == (path1, path2)
+    assert difference.unified_diff == expected.unified_diff
+    assert difference.details == expected.details
+
+
+@skip_unless_tools_exist('diff')
+def test_result_not_reused_after_upgrade(results, paths, monkeypatch):
+    compare_paths(*paths)
+    # Only look at the results stored in --cache-dir
+    results.results.clear()
+
+    monkeypatch.setattr(
+        resultcache, 'tool_fingerprints', lambda: [('diff', 'upgraded')],
+    )
+    compared = []
+    orig = compare.compare_specialized_files
+
+    def probe(file1, file2, source=None):
+        compared.append(file1.name)
+        return orig(file1, file2, source)
+    monkeypatch.setattr(compare, 'compare_specialized_files', probe)
+
+    compare_paths(*paths)
+    assert compared == [paths[0]]
+
+
+def test_digest_remembered_when_writing(tmpdir, monkeypatch):
+    path = str(tmpdir.join('a'))
+    with DigestingWriter(path) as f:
+        f.write(b'a\n')
+        f.write(b'b\n')
+
+    monkeypatch.setattr('builtins.open', None)
+    assert file_digest(path) == new_digest(b'a\nb\n').hexdigest()
+
+
+def make_tar(path, content):
+    with tarfile.open(path, 'w') as tar:
+        for name in ('one/lib', 'two/lib'):
+            tar.add(content, arcname=name)
+
+
+@skip_unless_tools_exist('diff')
+def test_same_pair_compared_once(paths, tmpdir, monkeypatch):
+    make_tar(str(tmpdir.join('a.tar')), paths[0])
+    make_tar(str(tmpdir.join('b.tar')), paths[1])
+
+    compared = []
+    orig = compare.compare_specialized_files
+
+    def probe(file1, file2, source=None):
+        compared.append(file1.name)
+        return orig(file1, file2, source)
+    monkeypatch.setattr(compare, 'compare_specialized_files', probe)
+
+    difference = compare_paths(
+        str(tmpdir.join('a.tar')),
+        str(tmpdir.join('b.tar')),
+    )
+    one, two = difference.details[1:]
+    assert (one.source1, one.source2) == ('one/lib', 'one/lib')
+    assert (two.source1, two.source2) == ('two/lib', 'two/lib')
+    assert one.unified_diff == two.unified_diff
+    assert compared.count('two/lib') == 0
+
+
+@skip_unless_tools_exist('diff')
+def test_deep_result_not_kept(paths, tmpdir):
+    for x, path in zip('ab', paths):
+        make_tar(str(tmpdir.join('inner-{}.tar'.format(x))), path)
+        with tarfile.open(str(tmpdir.join('{}.tar'.format(x))), 'w') as tar:
+            tar.add(str(tmpdir.join('inner-{}.tar'.format(x))), 'inner.tar')
+    compare_paths(str(tmpdir.join('a.tar')), str(tmpdir.join('b.tar')))
+    assert [x[:2] for x in ResultCache().results.values()] == [
+        ('one/lib', 'one/lib'),
+        ('inner.tar', 'inner.tar'),
+    ]
+
+
+@skip_unless_tools_exist('diff')
+def test_result_not_kept_in_worker(paths, monkeypatch):
+    monkeypatch.setattr(parallel, '_IN_WORKER', True)
+    compare_paths(*paths)
+    assert not ResultCache().results
+
+
+@skip_unless_tools_exist('diff')
+def test_least_recently_used_result_dropped(paths, tmpdir, monkeypatch):
+    monkeypatch.setattr(resultcache, 'MAX_KEPT_RESULTS', 2)
+    for x in range(3):
+        tmpdir.join(str(x)).write('{}\n'.format(x))
+    compare_paths(paths[0], str(tmpdir.join('0')))
+    compare_paths(paths[0], str(tmpdir.join('1')))
+    compare_paths(paths[0], str(tmpdir.join('0')))
+    compare_paths(paths[0], str(tmpdir.join('2')))
+    assert [x[1] for x in ResultCache().results.values()] == [
+        str(tmpdir.join('0')),
+        str(tmpdir.join('2')),
+    ]
+
+
+def test_eviction(tmpdir):
+    cache = DirectoryCache(str(tmpdir), 25)
+    for x in range(3):
+        with open(cache.filename(str(x)), 'w') as f:
+            f.write('x' * 10)
+        os.utime(f.name, (time.time() + x, time.time() + x))
+        cache.added(10)
+    assert sorted(os.listdir(str(tmpdir))) == ['1', '2']
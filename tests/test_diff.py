@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+import pytest
+
+from diffoscope.diff import diff, linediff, run_diff, FeederReader, \
+    ExternalDiff, InProcessDiff
+from diffoscope.diffseq import changes, unified_diff
+from diffoscope.feeders import from_text
+
+from .utils.tools import skip_unless_tools_exist
+
+CASES = (
+    ("", ""),
+    ("a\nb\nc\n", "a\nb\nc\n"),
+    ("a\nb\nc\n", "a\nB\nc\n"),
+    ("a\nb\nc", "a\nb\nc\n"),
+    ("a\nb\nc\n", "a\nb\nc"),
+    ("", "a\n"),
+    ("a\n", ""),
+    ("x\n" * 30, "x\n" * 31),
+    ("".join("%d\n" % x for x in range(40)),
+     "".join("%d\n" % x for x in range(40) if x % 17)),
+    ("a\nb\na\nb\nc\n", "b\na\nb\nc\nc\nb\n"),
+    ("\x00\xff\n\n", "\n\x00\n"),
+)
+
+
+def in_process(text1, text2):
+    readers = [FeederReader(from_text(text1)), FeederReader(from_text(text2))]
+    for x in readers:
+        x.fill(float('inf'))
+    return InProcessDiff().diff(*readers)
+
+
+@skip_unless_tools_exist('diff')
+@pytest.mark.parametrize('text1,text2', CASES)
+def test_in_process_same_as_diff(text1, text2):
+    external = run_diff(
+        FeederReader(from_text(text1)),
+        FeederReader(from_text(text2)),
+    )
+    assert in_process(text1, text2) == external
+
+
+def record_backends(monkeypatch):
+    used = []
+    for cls in (ExternalDiff, InProcessDiff):
+        def probe(self, reader1, reader2, orig=cls.diff):
+            used.append(self.__class__)
+            return orig(self, reader1, reader2)
+        monkeypatch.setattr(cls, 'diff', probe)
+    return used
+
+
+@skip_unless_tools_exist('diff')
+def test_small_input_in_process(monkeypatch):
+    used = record_backends(monkeypatch)
+    assert diff(from_text("a\nb\n"), from_text("a\nc\n")) == \
+        "@@ -1,2 +1,2 @@\n a\n-b\n+c\n"
+    assert used == [InProcessDiff]
+
+
+@skip_unless_tools_exist('diff')
+@pytest.mark.parametrize('lines,width', (
+    (InProcessDiff.max_lines + 1, 1),
+    (2, InProcessDiff.max_size),
+))
+def test_large_input_uses_diff(monkeypatch, lines, width):
+    used = record_backends(monkeypatch)
+    text = "".join("{}\n".format(str(x) * width) for x in range(lines))
+    assert diff(from_text(text), from_text(text + "x\n")).endswith("+x\n")
+    assert used == [ExternalDiff]
+
+
+@skip_unless_tools_exist('diff')
+def test_large_input_diff_output():
+    text1 = "".join("%d\n" % x for x in range(1000))
+    text2 = text1.replace("500\n", "")
+    assert diff(from_text(text1), from_text(text2)) == \
+        "@@ -494,15 +494,14 @@\n" + \
+        "".join(" %d\n" % x for x in range(493, 500)) + "-500\n" + \
+        "".join(" %d\n" % x for x in range(501, 508))
+
+
+def test_unified_diff_no_newline():
+    assert list(unified_diff(b"a", b"b\n")) == [
+        b"@@ -1 +1 @@\n",
+        b"-a\n",
+        b"\\ No newline at end of file\n",
+        b"+b\n",
+    ]
+
+
+def test_unified_diff_too_large():
+    with pytest.raises(ValueError):
+        list(unified_diff(b"a\n" * 5000, b"b\n"))
+
+
+@skip_unless_tools_exist('diff')
+@pytest.mark.parametrize('text1,text2', CASES)
+def test_hash_first(text1, text2):
+    expected = diff(from_text(text1), from_text(text2))
+    assert diff(from_text(text1), from_text(text2), hash_first=True) == expected
+
+
+@skip_unless_tools_exist('diff')
+def test_hash_first_spooled_to_disk(monkeypatch):
+    monkeypatch.setattr('diffoscope.diff.SPOOL_MEMORY_SIZE', 1024)
+    text = "a\n" * 100000
+    assert diff(from_text(text), from_text(text), hash_first=True) is None
+    assert diff(
+        from_text(text),
+        from_text(text + "b\n"),
+        hash_first=True,
+    ) == "@@ -99994,7 +99994,8 @@\n" + " a\n" * 7 + "+b\n"
+
+
+def test_linediff():
+    assert linediff("foo bar baz", "foo qux baz", '{', '}') == \
+        ("foo {bar} baz", "foo {qux} baz")
+    assert linediff("abc", "abXc", '{', '}') == ("abc", "ab{X}c")
+
+
+@pytest.mark.parametrize('too_expensive', (None, 1, 8))
+def test_changes_is_common_subsequence(too_expensive):
+    s = "".join(chr(97 + (x * 7) % 5) for x in range(1000))
+    t = "".join(chr(97 + (x * 3) % 7) for x in range(700))
+    changed1, changed2 = changes(s, t, too_expensive)
+    common1 = [x for x, c in zip(s, changed1) if not c]
+    common2 = [x for x, c in zip(t, changed2) if not c]
+    assert common1 == common2
+
+
+def test_linediff_long_lines():
+    s = "".join("{:x}".format(x) for x in range(20000))
+    t = s[:50000] + "X" + s[50001:]
+    assert linediff(s, t, '{', '}') == (
+        s[:50000] + "{" + s[50000] + "}" + s[50001:],
+        s[:50000] + "{X}" + s[50001:],
+    )
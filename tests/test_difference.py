@@ -56,6 +56,15 @@ def test_too_long_diff_block_lines(monkeypatch):
     assert_algebraic_properties(difference, 124)
 
 
+def test_more_input_than_pipes_hold():
+    # Much more than a pipe buffer so that diff(1) can only read one side
+    # while we are blocked writing to the other
+    text_a = "a\n" * 500000
+    text_b = text_a + "b"
+    difference = Difference.from_text(text_a, text_b, 'a', 'b')
+    assert difference.unified_diff.endswith(' a\n+b\n')
+
+
 def test_size_updates():
     d = Difference("0123456789", "path1", "path2")
     assert_size(d, 20)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+import pytest
+
+from diffoscope.config import Config
+from diffoscope.feeders import from_raw_reader, from_raw_chunks
+
+
+def run(feeder):
+    gen = feeder()
+    out = []
+    try:
+        while True:
+            out.append(next(gen))
+    except StopIteration as exc:
+        return b''.join(out), exc.value
+
+
+def lines(data):
+    return data.splitlines(keepends=True)
+
+
+def chunks(data, size):
+    return [data[x:x + size] for x in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('data', (
+    b'',
+    b'a\n',
+    b'a\nbb\nccc\n',
+    b'a\nbb\nccc',
+    b'\n\n\n\n\n\nx',
+    b''.join(b'%d\n' % x for x in range(100)),
+))
+@pytest.mark.parametrize('max_lines', (1, 3, 50, float('inf')))
+@pytest.mark.parametrize('size', (1, 3, 4096))
+def test_chunks_same_as_lines(monkeypatch, data, max_lines, size):
+    monkeypatch.setattr(Config(), 'max_diff_input_lines', max_lines)
+    expected, _ = run(from_raw_reader(lines(data)))
+    assert run(from_raw_chunks(chunks(data, size)))[0] == expected
+
+
+def test_chunks_end_nl():
+    assert run(from_raw_chunks([b'a\n', b'b']))[1] is False
+    assert run(from_raw_chunks([b'a', b'b\n']))[1] is True
@@ -23,6 +23,7 @@ import signal
 import tempfile
 
 from diffoscope.main import main
+from diffoscope.config import Config
 
 TEST_TAR1_PATH = os.path.join(os.path.dirname(__file__), 'data/test1.tar')
 TEST_TAR2_PATH = os.path.join(os.path.dirname(__file__), 'data/test2.tar')
@@ -143,3 +144,15 @@ def test_profiling(capsys):
     assert ret == 0
     assert "Profiling output for" in out
     assert err == ''
+
+
+def test_jobs(capsys, monkeypatch):
+    # Ensure --jobs does not leak into the Config() of subsequent tests
+    monkeypatch.setattr(Config(), 'jobs', Config().jobs)
+
+    _, serial, _ = run(capsys, *TEST_TARS)
+    ret, out, err = run(capsys, '--jobs=4', *TEST_TARS)
+
+    assert ret == 1
+    assert err == ''
+    assert out == serial
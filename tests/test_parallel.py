@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import time
+
+from diffoscope.config import Config
+from diffoscope.parallel import parallel_starmap
+from diffoscope.scheduler import Scheduler
+
+
+def slow_first(idx):
+    if idx == 0:
+        time.sleep(0.5)
+    return idx
+
+
+def test_results_in_order(monkeypatch):
+    monkeypatch.setattr(Config(), 'jobs', 3)
+    results = parallel_starmap(slow_first, ((x,) for x in range(10)))
+    assert list(results) == list(range(10))
+
+
+def test_consumed_lazily(monkeypatch):
+    monkeypatch.setattr(Config(), 'jobs', 2)
+    pulled = []
+
+    def iterable():
+        for x in range(10):
+            pulled.append(x)
+            yield (x,)
+
+    results = parallel_starmap(slow_first, iterable())
+    assert next(results) == 0
+    # The others finished long before the first one, but were not replaced
+    assert pulled == [0, 1]
+    assert list(results) == list(range(1, 10))
+
+
+def hold_slot(idx, marker):
+    if idx == 1:
+        Scheduler().acquire()
+        open(marker, 'w').close()
+        time.sleep(60)
+    return idx
+
+
+def test_terminated_worker_gives_back_slot(monkeypatch, tmpdir):
+    monkeypatch.setattr(Config(), 'jobs', 2)
+    Scheduler().setup(1, makeflags='')
+    try:
+        marker = str(tmpdir.join('acquired'))
+        results = parallel_starmap(hold_slot, ((x, marker) for x in range(2)))
+        assert next(results) == 0
+        while not os.path.exists(marker):
+            time.sleep(0.01)
+
+        # Stops the worker holding the only slot
+        results.close()
+
+        assert Scheduler().pools[0].take() == b'+'
+    finally:
+        Scheduler().reset()
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+# diffoscope: in-depth comparison of files, archives, and directories
+#
+# Copyright © 2026 agent <agent@local>
+#
+# diffoscope is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# diffoscope is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import pytest
+import threading
+
+from diffoscope.scheduler import Scheduler, parse_makeflags
+
+
+@pytest.fixture
+def scheduler():
+    Scheduler().reset()
+    yield Scheduler()
+    Scheduler().reset()
+
+
+def acquire_in_thread(scheduler):
+    acquired = threading.Event()
+
+    def run():
+        scheduler.release(scheduler.acquire())
+        acquired.set()
+
+    threading.Thread(target=run, daemon=True).start()
+    return acquired
+
+
+def test_parse_makeflags():
+    assert parse_makeflags('') is None
+    assert parse_makeflags(' -j4') is None
+    assert parse_makeflags(' -j4 --jobserver-fds=3,4 -j') == (3, 4)
+    assert parse_makeflags(
+        ' -j4 --jobserver-auth=3,4 --jobserver-auth=5,6',
+    ) == (5, 6)
+    assert parse_makeflags(
+        '-j4 --jobserver-auth=fifo:/tmp/GMfifo1',
+    ) == '/tmp/GMfifo1'
+
+
+def test_unlimited(scheduler):
+    slots = [scheduler.acquire() for _ in range(16)]
+    for x in slots:
+        scheduler.release(x)
+
+
+def test_limit(scheduler):
+    scheduler.setup(2, makeflags='')
+
+    slots = [scheduler.acquire(), scheduler.acquire()]
+    acquired = acquire_in_thread(scheduler)
+    assert not acquired.wait(0.2)
+
+    scheduler.release(slots.pop())
+    assert acquired.wait(5)
+    scheduler.release(slots.pop())
+
+
+def test_nested_slots(scheduler):
+    scheduler.setup(1, makeflags='')
+
+    with scheduler.slot():
+        slot = scheduler.current()
+        with scheduler.slot():
+            assert scheduler.current() is slot
+        assert scheduler.current() is slot
+    assert scheduler.current() is None
+
+    scheduler.release(scheduler.acquire())
+
+
+def test_jobserver(scheduler):
+    read_fd, write_fd = os.pipe()
+    try:
+        os.write(write_fd, b'x')
+        scheduler.setup(8, makeflags='-j2 --jobserver-auth={},{}'.format(
+            read_fd,
+            write_fd,
+        ))
+
+        # The slot make implicitly granted us and the one in its pipe
+        implicit = scheduler.acquire()
+        slot = scheduler.acquire()
+        assert slot.token == b'x'
+
+        acquired = acquire_in_thread(scheduler)
+        assert not acquired.wait(0.2)
+
+        scheduler.release(slot)
+        assert acquired.wait(5)
+        scheduler.release(implicit)
+
+        assert os.read(read_fd, 1) == b'x'
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+
+
+def test_jobserver_unavailable(scheduler):
+    # eg. the recipe was not marked as recursive so make closed its pipe
+    # and the descriptors were reused
+    fd = os.open(os.devnull, os.O_RDWR)
+    try:
+        scheduler.setup(1, makeflags='--jobserver-auth={0},{0}'.format(fd))
+    finally:
+        os.close(fd)
+
+    slot = scheduler.acquire()
+    acquired = acquire_in_thread(scheduler)
+    assert not acquired.wait(0.2)
+    scheduler.release(slot)
+    assert acquired.wait(5)
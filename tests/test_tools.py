@@ -18,6 +18,7 @@
 # along with diffoscope.  If not, see <https://www.gnu.org/licenses/>.
 
 import os
+import re
 import pytest
 
 
@@ -41,3 +42,17 @@ def test_required_tool_not_found():
 
     with pytest.raises(RequiredToolNotFound):
         fn()
+
+
+def test_required_tools_known():
+    # Their versions are part of the key of results stored in --cache-dir
+    from diffoscope.external_tools import EXTERNAL_TOOLS
+
+    root = os.path.join(os.path.dirname(__file__), '..', 'diffoscope')
+    for dirpath, _, filenames in os.walk(root):
+        for x in filenames:
+            if not x.endswith('.py'):
+                continue
+            with open(os.path.join(dirpath, x)) as f:
+                for tool in re.findall(r"@tool_required\('([^']+)'\)", f.read()):
+                    assert tool in EXTERNAL_TOOLS